@@ -1,8 +1,16 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, stream_with_context
+import click
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
-import os, re, glob, csv, json
+import os, io, re, sys, glob, json, hashlib, zlib, functools
+from store import PlanetStore, MoleculeMatrix
+from cache import ResponseCache
+from search import SearchIndex
+from snapshot import load_table
+from smoothing import rolling_median
+import wire
+from downsample import LODPyramid, METHODS as LOD_METHODS, lod_level
 
 APP_TITLE = "Exoplanet Atmospheres — Dark Demo"
 app = Flask(__name__)
@@ -14,26 +22,30 @@ DATA_PATH = os.environ.get("EXO_DATA_PATH", "")
 if not DATA_PATH:
     candidates = sorted(glob.glob(os.path.join(BASE_DIR, "*.csv")))
     DATA_PATH = candidates[0] if candidates else os.path.join(BASE_DIR, "iac_exoplanet_atmospheres-20251002.csv")
-print(f"[CSV] Using path: {DATA_PATH}")
+print(f"[CSV] Using path: {DATA_PATH}", file=sys.stderr)
+# parsed columnar copy of the CSV, rebuilt only when the CSV content changes
+SNAPSHOT_DIR = os.environ.get("EXO_SNAPSHOT_DIR", os.path.join(BASE_DIR, "snapshot"))
+
+# ---------- /api/data CACHE CONFIG ----------
+DATA_CACHE_ENTRIES = int(os.environ.get("EXO_DATA_CACHE_ENTRIES", "512"))
+DATA_CACHE_MB = float(os.environ.get("EXO_DATA_CACHE_MB", "64"))
+WARM_CACHE = os.environ.get("EXO_WARM_CACHE", "0") == "1"  # precompute every planet at startup
+LOD_CACHE_SIZE = int(os.environ.get("EXO_LOD_CACHE_SIZE", "256"))  # planets whose LOD pyramids are kept
 
 # ---------- EXACT CSV LOADER (matches user's code) ----------
 def read_csv_exact(path: str) -> pd.DataFrame:
-    df = pd.read_csv(
-        path,
-        sep=";",                 # semicolon separator
-        engine="python",         # tolerant parser
-        quoting=csv.QUOTE_NONE,  # treat " as a normal character
-        on_bad_lines="skip",     # skip malformed rows (pandas ≥1.3)
-        encoding="utf-8"
-    )
+    # sep=";", QUOTE_NONE (" is a normal character), skip malformed rows;
+    # C-engine parse, served from the memory-mapped snapshot when it is current
+    df = load_table(path, SNAPSHOT_DIR)
     # to match your terminal prints during startup
-    print("Shape:", df.shape)
-    print("Columns:", df.columns.tolist())
+    print("Shape:", df.shape, file=sys.stderr)
+    print("Columns:", df.columns.tolist(), file=sys.stderr)
     return df
 
 # ---------- COLUMN HELPERS ----------
 def _normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    # shallow: renaming must not copy the memory-mapped snapshot columns
+    df = df.copy(deep=False)
     df.columns = [re.sub(r"[^a-z0-9_]+", "", c.strip().lower().replace(" ", "_")) for c in df.columns]
     return df
 
@@ -90,17 +102,18 @@ def load_data():
     }
 
     if "molecules" in raw.columns:
-        print("\nMolecules column preview:")
+        print("\nMolecules column preview:", file=sys.stderr)
         try:
-            print(raw["molecules"].dropna().head(10))
+            print(raw["molecules"].dropna().head(10), file=sys.stderr)
         except Exception as e:
-            print(f"(preview failed) {e}")
+            print(f"(preview failed) {e}", file=sys.stderr)
     else:
-        print("\nNo 'molecules' column found.")
+        print("\nNo 'molecules' column found.", file=sys.stderr)
 
     return df, meta
 
 DF, META = load_data()
+STORE = PlanetStore(DF, META)  # planet -> rows index + pre-coerced numeric series
 
 # ---------- SYNTHETIC SERIES ----------
 def _num(x, default=np.nan):
@@ -108,7 +121,8 @@ def _num(x, default=np.nan):
     except Exception: return default
 
 def _rng_for(name: str):
-    seed = abs(hash(str(name))) % (2**32 - 1)
+    # crc32 instead of the salted built-in hash(): same seed in every worker and restart
+    seed = zlib.crc32(str(name).encode("utf-8"))
     return np.random.RandomState(seed)
 
 def synth_transit(row):
@@ -160,6 +174,78 @@ def synth_spectra(row):
 
     return wl.tolist(), np.clip(morning, 0, None).tolist(), wl.tolist(), np.clip(evening, 0, None).tolist()
 
+def synth_batch(planets):
+    """
+    synth_transit + synth_spectra for many planets in one vectorized pass.
+    Grids are shared 1-D arrays, series are (n_planets, n_points) arrays.
+    Each planet still draws its noise from its own _rng_for stream, so the
+    rows equal the per-planet functions bit for bit (see check_synth_batch).
+    """
+    rows = [STORE.first_row(p) for p in planets]
+    col = lambda c: np.array([_num(r.get(c, np.nan)) for r in rows], dtype=np.float64)
+    rp, rs, teq = col("radius"), col("star_radius"), col("temp_calculated")
+
+    # one standard-normal stream per planet: normal(0, s) == s * z in legacy RandomState
+    z = np.stack([_rng_for(r.get(META["planet_col"], "Unknown")).standard_normal(240) for r in rows]) \
+        if rows else np.empty((0, 240))
+
+    # ---------- Transit ----------
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.minimum(np.maximum(rp / (rs * 10.0), 0.03), 0.35)
+    rp_rs = np.where(np.isnan(rp) | np.isnan(rs) | ~(rs > 0), 0.1, ratio)
+    depth = np.clip(rp_rs**2, 0.002, 0.03)[:, None]
+
+    total_hours, center, duration, tau = 6.0, 3.0, 2.0, 0.25
+    t = np.linspace(0, total_hours, 240)
+    t1, t4 = center - duration/2, center + duration/2
+    t2, t3 = t1 + tau, t4 - tau
+    in_ingress = (t >= t1) & (t < t2)
+    in_flat    = (t >= t2) & (t <= t3)
+    in_egress  = (t >  t3) & (t <= t4)
+    y_model = np.ones((len(rows), t.size))
+    y_model[:, in_ingress] = 1.0 - depth * (t[in_ingress] - t1) / (t2 - t1)
+    y_model[:, in_flat]    = 1.0 - depth
+    y_model[:, in_egress]  = 1.0 - depth * (1.0 - (t[in_egress] - t3) / (t4 - t3))
+    y_obs = y_model + 0.0006 * z
+
+    # ---------- Spectra ----------
+    base = np.clip(0.02 + 0.00001 * np.where(np.isnan(teq), 0, teq), 0.01, 0.06)[:, None]
+    wl = np.linspace(2.0, 5.2, 90)
+    water_amp, co2_amp = base * 1.8, base * 2.4
+
+    morning = base + water_amp * _gauss(wl, 2.75, 0.18) + co2_amp * _gauss(wl, 4.30, 0.12)
+    morning *= (0.92 + 0.02 * np.sin(wl*1.3))
+    morning += 0.001 * z[:, :90]
+
+    evening = base + water_amp * 1.12 * _gauss(wl, 2.80, 0.20) + co2_amp * 1.08 * _gauss(wl, 4.28, 0.14)
+    evening *= (0.98 + 0.02 * np.cos(wl*0.9))
+    evening += 0.001 * z[:, 90:180]
+
+    return {
+        "time": t,
+        "brightness": y_obs,
+        "model_brightness": y_model,
+        "depth": depth[:, 0],
+        "wavelength": wl,
+        "morning": np.clip(morning, 0, None),
+        "evening": np.clip(evening, 0, None),
+    }
+
+def check_synth_batch(planets=None):
+    """True if synth_batch matches synth_transit/synth_spectra exactly for `planets` (default: all)."""
+    planets = STORE.names() if planets is None else planets
+    batch = synth_batch(planets)
+    for i, p in enumerate(planets):
+        row = STORE.first_row(p)
+        t, y, y_model, _ = synth_transit(row)
+        wl_m, y_m, _, y_e = synth_spectra(row)
+        pairs = [(t, batch["time"]), (y, batch["brightness"][i]), (y_model, batch["model_brightness"][i]),
+                 (wl_m, batch["wavelength"]), (y_m, batch["morning"][i]), (y_e, batch["evening"][i])]
+        if not all(np.array_equal(np.asarray(a), b) for a, b in pairs):
+            print(f"[SYNTH] mismatch for {p!r}", file=sys.stderr)
+            return False
+    return True
+
 # ---------- MOLECULES ----------
 MOLECULE_LAMBDA = {
     "H2O": 2.8, "CO2": 4.3, "CO": 4.6, "CH4": 3.3, "HCN": 3.0, "SO2": 4.05, "H2S": 3.9
@@ -213,16 +299,19 @@ def parse_molecules_cell(cell):
 
     return sorted(set(detected))
 
+def build_molecule_matrix(df, meta):
+    cells = df[meta["molecules_col"]] if meta.get("molecules_col") else [None] * len(df)
+    return MoleculeMatrix(cells, parse_molecules_cell, set(MOLECULE_LAMBDA) | set(FRIENDLY))
+
+MOLECULES = build_molecule_matrix(DF, META)  # row -> detected molecules, parsed once
+
 def nearest_y(x_list, y_list, x0):
     if not x_list or not y_list: return None
     arrx = np.asarray(x_list); arry = np.asarray(y_list)
     idx = int(np.argmin(np.abs(arrx - x0)))
     return float(arry[idx])
 
-def build_molecule_labels(row, wl_m, y_m, wl_e, y_e):
-    detected = []
-    if META.get("molecules_col"):
-        detected = parse_molecules_cell(row.get(META["molecules_col"]))
+def build_molecule_labels(detected, wl_m, y_m, wl_e, y_e):
     if not detected:
         return []
     labels = []
@@ -251,6 +340,55 @@ def get_type_planet_map():
         mapping[t] = sorted(group[pcol].unique().tolist())
     return mapping
 
+# ---------- CACHED RESPONSES ----------
+def _dumps(payload):
+    return app.json.dumps(payload, separators=(",", ":"))
+
+def _encode(payload, fmt="json"):
+    """Pre-serialized body (in wire format `fmt`) and its ETag."""
+    if fmt == "compact":
+        body = wire.encode_compact(payload, _dumps)
+    elif fmt == "binary":
+        body = wire.encode_binary(payload, _dumps)
+    else:
+        body = (_dumps(payload) + "\n").encode("utf-8")
+    return body, hashlib.sha1(body).hexdigest()
+
+def build_type_cache():
+    """Encode /api/types and every /api/planets answer once per data load."""
+    mapping = get_type_planet_map()
+    return {
+        "mapping": mapping,
+        "types": _encode({"types": list(mapping.keys()), "type_planet_map": mapping}),
+        "planets": {t: _encode({"planets": planets}) for t, planets in mapping.items()},
+        "no_planets": _encode({"planets": []}),
+    }
+
+def cached_json(entry, fmt="json"):
+    """Serve a pre-encoded body; If-None-Match with the current ETag gets a 304."""
+    body, etag = entry
+    resp = app.response_class(body, mimetype=wire.MIMETYPES[fmt])
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"  # always revalidate, 304 when unchanged
+    return resp.make_conditional(request)
+
+def reload_data():
+    """(Re)load the catalogue and rebuild everything derived from it."""
+    global DF, META, STORE, MOLECULES, SEARCH, TYPE_CACHE
+    DF, META = load_data()
+    STORE = PlanetStore(DF, META)
+    MOLECULES = build_molecule_matrix(DF, META)
+    SEARCH = SearchIndex(STORE, MOLECULES, META)
+    TYPE_CACHE = build_type_cache()
+    DATA_CACHE.clear()
+    planet_lod.cache_clear()
+    if WARM_CACHE:
+        warm_data_cache()
+
+SEARCH = SearchIndex(STORE, MOLECULES, META)
+TYPE_CACHE = build_type_cache()
+DATA_CACHE = ResponseCache(DATA_CACHE_ENTRIES, int(DATA_CACHE_MB * 1024 * 1024))
+
 # ---------- ROUTES ----------
 @app.route("/")
 def index():
@@ -259,49 +397,206 @@ def index():
 @app.get("/api/types")
 def get_types():
     """Get all available exoplanet types"""
-    mapping = get_type_planet_map()
-    return jsonify({
-        "types": list(mapping.keys()),
-        "type_planet_map": mapping
-    })
+    return cached_json(TYPE_CACHE["types"])
 
 @app.get("/api/planets")
 def planets_for_type():
     """Get planets for a specific type"""
     t = request.args.get("type", "")
-    mapping = get_type_planet_map()
-    return jsonify({
-        "planets": mapping.get(t, [])
-    })
+    return cached_json(TYPE_CACHE["planets"].get(t, TYPE_CACHE["no_planets"]))
 
 @app.get("/api/data")
 def data_for_planet():
-    """Get all data for a specific planet"""
+    """
+    Get all data for a specific planet.
+    JSON by default; the compact (base64 float32) or binary encodings from
+    wire.py are chosen with the Accept header or ?format=compact|binary.
+    ?max_points=N returns series longer than N downsampled to the largest
+    LOD level <= N (64, 128, 256, ...), with ?downsample=lttb|minmax;
+    N below the smallest level (64) is a 400.
+    """
     planet = request.args.get("planet", "")
-    pcol = META["planet_col"]
-    sub = DF[DF[pcol].astype(str) == str(planet)].copy()
-    row = sub.iloc[0].to_dict() if len(sub) else {}
+    fmt = request.args.get("format")
+    if fmt is None:
+        best = request.accept_mimetypes.best_match(list(wire.MIMETYPES.values()), default=wire.MIMETYPES["json"])
+        fmt = next(k for k, v in wire.MIMETYPES.items() if v == best)
+    elif fmt not in wire.MIMETYPES:
+        return jsonify({"success": False, "error": f"unknown format {fmt!r}; use one of {list(wire.MIMETYPES)}"}), 400
+
+    level, method = None, request.args.get("downsample", "lttb")
+    if request.args.get("max_points"):
+        try:
+            max_points = int(request.args["max_points"])
+        except ValueError:
+            return jsonify({"success": False, "error": "max_points must be an integer"}), 400
+        try:
+            level = lod_level(max_points)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if method not in LOD_METHODS:
+            return jsonify({"success": False, "error": f"unknown downsample {method!r}; use one of {list(LOD_METHODS)}"}), 400
+
+    build = lambda: _encode(build_planet_payload(planet) if level is None else lod_payload(planet, level, method), fmt)
+    if planet not in STORE:
+        # unknown names are not cached, so arbitrary queries can't flush the cache
+        resp = cached_json(build(), fmt)
+    else:
+        key = (planet, fmt) if level is None else (planet, fmt, level, method)
+        resp = cached_json(DATA_CACHE.get_or_build(key, build), fmt)
+    resp.vary.add("Accept")
+    return resp
+
+@app.get("/api/cache")
+def data_cache_stats():
+    """Hit/miss/eviction counters of the /api/data response cache"""
+    return jsonify(DATA_CACHE.stats())
+
+@app.get("/api/molecules")
+def molecule_counts():
+    """Number of planets with each molecule detected (optionally within one type)"""
+    first_rows = [idx[0] for idx in STORE.offsets.values()]
+    t = request.args.get("type")
+    if t:
+        tcol = META["type_col"]
+        first_rows = [i for i in first_rows if STORE.records[i].get(tcol) == t]
+    return jsonify({"counts": MOLECULES.counts(first_rows), "planets": len(first_rows), "success": True})
+
+@app.get("/api/search")
+def search_planets():
+    """
+    Filter planets, e.g. /api/search?type=Hot Jupiter&molecules=H2O,CO2&tsm_min=100&star_teff_max=5000
+      type / planet_status / observation_type: repeat the parameter to match any of several values
+      molecules: comma-separated (or repeated), all must be detected
+      <numeric>_min / <numeric>_max: inclusive range on tsm, esm, temp_calculated, radius, ...
+      sort=<numeric>&order=asc|desc, page (1-based), per_page (max 500), count_only=1
+    """
+    args = request.args
+    try:
+        categorical = {f: args.getlist(f) for f in SEARCH.categorical if args.getlist(f)}
+        molecules = [m for v in args.getlist("molecules") for m in v.split(",") if m.strip()]
+        ranges = {}
+        for field in SEARCH.numeric:
+            lo, hi = args.get(f"{field}_min"), args.get(f"{field}_max")
+            if lo is not None or hi is not None:
+                ranges[field] = (None if lo is None else float(lo), None if hi is None else float(hi))
+        sort = args.get("sort") or None
+        if sort is not None and sort not in SEARCH.numeric:
+            raise ValueError(f"cannot sort by {sort!r}; numeric fields: {sorted(SEARCH.numeric)}")
+        page = max(1, int(args.get("page", 1)))
+        per_page = min(500, max(1, int(args.get("per_page", 50))))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    ids = SEARCH.search(categorical, molecules, ranges, sort, args.get("order") == "desc")
+    out = {"count": int(len(ids)), "page": page, "per_page": per_page, "success": True}
+    if args.get("count_only") in ("1", "true"):
+        return jsonify(out)
+
+    shown = [f for f in SEARCH.numeric if f in ranges or f == sort]
+    tcol = META["type_col"]
+    results = []
+    for pid in ids[(page - 1) * per_page: page * per_page]:
+        item = {"planet": SEARCH.names[pid], "type": STORE.records[SEARCH.first_rows[pid]].get(tcol)}
+        for f in shown:
+            v = SEARCH.values[f][pid]
+            item[f] = None if np.isnan(v) else float(v)
+        results.append(item)
+    out["results"] = results
+    return jsonify(out)
+
+def write_synth_export(f, planets):
+    """All synthetic series for `planets` as one .npz (names + shared grids + 2-D series arrays)."""
+    batch = synth_batch(planets)
+    np.savez(f, planet=np.array(planets, dtype=str), **batch)
+
+@app.get("/api/export/synthetic")
+def export_synthetic():
+    """Bulk export of the synthetic transit/spectra series as .npz (optionally one ?type=)"""
+    t = request.args.get("type")
+    planets = TYPE_CACHE["mapping"].get(t, []) if t else STORE.names()
+    buf = io.BytesIO()
+    write_synth_export(buf, planets)
+    resp = app.response_class(buf.getvalue(), mimetype="application/octet-stream")
+    resp.headers["Content-Disposition"] = "attachment; filename=synthetic_series.npz"
+    return resp
+
+@app.cli.command("export-synth")
+@click.argument("path", default="synthetic_series.npz")
+@click.option("--type", "planet_type", default=None, help="only planets of this type")
+def export_synth_command(path, planet_type):
+    """Write the synthetic series of every planet to PATH (.npz)."""
+    planets = TYPE_CACHE["mapping"].get(planet_type, []) if planet_type else STORE.names()
+    with open(path, "wb") as f:
+        write_synth_export(f, planets)
+    print(f"[EXPORT] {len(planets)} planets -> {path}")
+
+def iter_ndjson(planet_type=None, offset=0, limit=None):
+    """
+    One /api/data JSON payload per line for every planet (or one type), in a
+    stable order. Lines are built one at a time and not retained, so memory
+    stays flat; bodies already in DATA_CACHE are reused but the export does
+    not fill the cache. Resume with offset = number of lines received.
+    """
+    planets = TYPE_CACHE["mapping"].get(planet_type, []) if planet_type else STORE.names()
+    stop = len(planets) if limit is None else offset + limit
+    for planet in planets[offset:stop]:
+        entry = DATA_CACHE.peek((planet, "json"))
+        yield entry[0] if entry is not None else _encode(build_planet_payload(planet))[0]
+
+@app.get("/api/export/ndjson")
+def export_ndjson():
+    """Stream the enriched dataset as NDJSON: ?type=, ?offset= (resume), ?limit="""
+    try:
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = request.args.get("limit")
+        limit = None if limit is None else max(0, int(limit))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    lines = iter_ndjson(request.args.get("type") or None, offset, limit)
+    return app.response_class(stream_with_context(lines), mimetype="application/x-ndjson")
+
+@app.cli.command("export-ndjson")
+@click.argument("path", default="-")
+@click.option("--type", "planet_type", default=None, help="only planets of this type")
+@click.option("--offset", default=0, help="skip this many planets (resume a partial export)")
+@click.option("--check", is_flag=True, help="verify that every line parses as one JSON object")
+def export_ndjson_command(path, planet_type, offset, check):
+    """
+    Write the enriched dataset as NDJSON to PATH (default stdout); appends
+    when resuming with --offset. Diagnostics go to stderr, so stdout carries
+    only NDJSON.
+    """
+    with click.open_file(path, "ab" if offset and path != "-" else "wb") as f:
+        for i, line in enumerate(iter_ndjson(planet_type, offset), start=offset):
+            if check:
+                try:
+                    if not line.endswith(b"\n") or not isinstance(json.loads(line), dict):
+                        raise ValueError("not a newline-terminated JSON object")
+                except ValueError as e:
+                    raise click.ClickException(f"line {i + 1} is not valid NDJSON: {e}")
+            f.write(line)
+
+def build_planet_payload(planet):
+    """The full /api/data payload for one planet (deterministic per planet name)."""
+    row = STORE.first_row(planet)
+    detected_syms = MOLECULES.detected(STORE.rows(planet))
 
     # ---------- Transit ----------
     tcol, bcol = META["time_col"], META["bright_col"]
     transit = {"time": [], "brightness": [], "model_brightness": [], "labels": []}
-    if tcol and bcol and tcol in sub.columns and bcol in sub.columns:
-        tmp = sub[[tcol, bcol]].copy()
-        tmp[tcol] = pd.to_numeric(tmp[tcol], errors="coerce")
-        tmp[bcol] = pd.to_numeric(tmp[bcol], errors="coerce")
-        tmp = tmp.dropna().sort_values(tcol)
-        if len(tmp):
-            y = tmp[bcol].to_numpy()
+    if STORE.has_series(tcol, bcol):
+        t_obs, y = STORE.series(planet, tcol, bcol)
+        if len(t_obs):
             window = max(5, min(31, len(y)//10*2+1))
-            y_model = pd.Series(y).rolling(window, center=True, min_periods=1).median().to_numpy()
+            y_model = rolling_median(y, window)
             transit = {
-                "time": tmp[tcol].tolist(),
-                "brightness": tmp[bcol].tolist(),
+                "time": t_obs.tolist(),
+                "brightness": y.tolist(),
                 "model_brightness": y_model.tolist(),
                 "labels": [
-                    {"x": float(tmp[tcol].iloc[0]),   "y": 1.0005, "text": "Starlight"},
-                    {"x": float(tmp[tcol].iloc[-1]),  "y": 1.0005, "text": "Starlight"},
-                    {"x": float(tmp[tcol].median()),  "y": float(min(y_model)+0.002), "text": "Starlight blocked by planet\nand its atmosphere"}
+                    {"x": float(t_obs[0]),          "y": 1.0005, "text": "Starlight"},
+                    {"x": float(t_obs[-1]),         "y": 1.0005, "text": "Starlight"},
+                    {"x": float(np.median(t_obs)),  "y": float(min(y_model)+0.002), "text": "Starlight blocked by planet\nand its atmosphere"}
                 ]
             }
         else:
@@ -314,18 +609,12 @@ def data_for_planet():
     # ---------- Spectra ----------
     wcol, mcol, ecol = META["wave_col"], META["morning_col"], META["evening_col"]
     wl_m, y_m, wl_e, y_e = synth_spectra(row)
-    if wcol and mcol and wcol in sub.columns and mcol in sub.columns:
-        tm = sub[[wcol, mcol]].copy()
-        tm[wcol] = pd.to_numeric(tm[wcol], errors="coerce")
-        tm[mcol] = pd.to_numeric(tm[mcol], errors="coerce")
-        tm = tm.dropna().sort_values(wcol)
-        if len(tm): wl_m, y_m = tm[wcol].tolist(), tm[mcol].tolist()
-    if wcol and ecol and wcol in sub.columns and ecol in sub.columns:
-        te = sub[[wcol, ecol]].copy()
-        te[wcol] = pd.to_numeric(te[wcol], errors="coerce")
-        te[ecol] = pd.to_numeric(te[ecol], errors="coerce")
-        te = te.dropna().sort_values(wcol)
-        if len(te): wl_e, y_e = te[wcol].tolist(), te[ecol].tolist()
+    if STORE.has_series(wcol, mcol):
+        x, y = STORE.series(planet, wcol, mcol)
+        if len(x): wl_m, y_m = x.tolist(), y.tolist()
+    if STORE.has_series(wcol, ecol):
+        x, y = STORE.series(planet, wcol, ecol)
+        if len(x): wl_e, y_e = x.tolist(), y.tolist()
 
     spectra = {
         "wavelength_morning": wl_m,
@@ -333,7 +622,7 @@ def data_for_planet():
         "wavelength_evening": wl_e,
         "evening": y_e,
         "wavelength": wl_m if len(wl_m) else wl_e,
-        "labels": build_molecule_labels(row, wl_m, y_m, wl_e, y_e)
+        "labels": build_molecule_labels(detected_syms, wl_m, y_m, wl_e, y_e)
     }
 
     # ---------- Molecules (list for dashboard + raw for debug) ----------
@@ -344,23 +633,58 @@ def data_for_planet():
         if raw_val is not None and not (isinstance(raw_val, float) and np.isnan(raw_val)):
             molecules_raw = str(raw_val)  # optional: show somewhere if you want
 
-        detected_syms = parse_molecules_cell(raw_val)
         known_syms = set(MOLECULE_LAMBDA.keys()) | set(FRIENDLY.keys())
         for sym in detected_syms:
             if sym in known_syms:
                 molecules_list.append({"symbol": sym, "name": FRIENDLY.get(sym, sym)})
 
-    # small debug print on each request
-    print(f"[DATA] planet={planet!r} | molecules_raw={molecules_raw!r} | molecules={[m['symbol'] for m in molecules_list]}")
+    # small debug print each time a payload is built (cache hits skip it)
+    print(f"[DATA] planet={planet!r} | molecules_raw={molecules_raw!r} | molecules={[m['symbol'] for m in molecules_list]}", file=sys.stderr)
 
-    return jsonify({
+    return {
         "transit": transit,
         "spectra": spectra,
         "molecules": molecules_list,
         "molecules_raw": molecules_raw,
         "planet": planet,
         "success": True
-    })
+    }
+
+# ---------- LEVEL OF DETAIL ----------
+# Series reduced by ?max_points: (x key, y key, companions sharing the selection)
+LOD_SERIES = {
+    "transit": {"light_curve": ("time", "brightness", ("model_brightness",))},
+    "spectra": {
+        "morning": ("wavelength_morning", "morning", ("wavelength",)),
+        "evening": ("wavelength_evening", "evening", ()),
+    },
+}
+
+def build_lod(planet, method):
+    payload = build_planet_payload(planet)
+    return payload, {sec: LODPyramid(payload[sec], series, method) for sec, series in LOD_SERIES.items()}
+
+@functools.lru_cache(maxsize=LOD_CACHE_SIZE)
+def planet_lod(planet, method):
+    """(full payload, {section: LODPyramid}) for a catalogue planet, built once per data load."""
+    return build_lod(planet, method)
+
+def lod_payload(planet, level, method="lttb"):
+    payload, pyramids = planet_lod(planet, method) if planet in STORE else build_lod(planet, method)
+    out = dict(payload)
+    for sec, pyramid in pyramids.items():
+        out[sec] = pyramid.view(level)
+    out["lod"] = {"level": level, "method": method}
+    return out
+
+def warm_data_cache():
+    """Precompute and encode /api/data for every planet."""
+    for planet in STORE.names():
+        DATA_CACHE.put((planet, "json"), _encode(build_planet_payload(planet)))
+    print(f"[CACHE] warmed /api/data for {len(STORE)} planets", file=sys.stderr)
+
+if WARM_CACHE:
+    warm_data_cache()
 
 # ---------- MAIN ----------
 if __name__ == "__main__":
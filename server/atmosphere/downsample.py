@@ -0,0 +1,99 @@
+import numpy as np
+
+# ---------- SHAPE-PRESERVING DOWNSAMPLING ----------
+# Both return sorted indices into the input, so the same selection can be
+# applied to companion series (e.g. the smoothed model under a light curve).
+
+METHODS = ("lttb", "minmax")
+MIN_LEVEL = 64  # smallest LOD level; levels double up to the full resolution
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: keeps first/last points and, per bucket, the point spanning the largest triangle."""
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    n_out = max(n_out, 3)
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.intp)  # n_out - 2 buckets over the interior
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], max(edges[b + 1], edges[b] + 1)
+        # average of the next bucket (or the last point) is the triangle's third vertex
+        nlo, nhi = hi, (max(edges[b + 2], hi + 1) if b + 2 < len(edges) else n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    return out
+
+def minmax_indices(y, n_out):
+    """Min and max of n_out // 2 equal buckets (plus first/last), in index order."""
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    buckets = max(1, n_out // 2 - 1)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    filled = ~np.all(np.isnan(blocks), axis=1)
+    blocks, offsets = blocks[filled], offsets[filled]
+    picks = np.concatenate([offsets + np.nanargmin(blocks, axis=1),
+                            offsets + np.nanargmax(blocks, axis=1), [0, n - 1]])
+    return np.unique(picks)
+
+def downsample_indices(x, y, n_out, method="lttb"):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    return lttb_indices(x, y, n_out)
+
+def lod_levels(n):
+    """Point counts of the pyramid for an n-point series: MIN_LEVEL, 2*MIN_LEVEL, ... < n."""
+    levels, size = [], MIN_LEVEL
+    while size < n:
+        levels.append(size)
+        size *= 2
+    return levels
+
+def lod_level(max_points):
+    """The pyramid level served for max_points: the largest power-of-two multiple of MIN_LEVEL <= max_points."""
+    if max_points < MIN_LEVEL:
+        raise ValueError(f"max_points must be at least {MIN_LEVEL}")
+    level = MIN_LEVEL
+    while level * 2 <= max_points:
+        level *= 2
+    return level
+
+# ---------- LEVEL-OF-DETAIL PYRAMID ----------
+class LODPyramid:
+    """
+    Downsampled views of one planet's series at every level, each taken
+    from the full resolution (not from the level above) so shapes survive.
+    series: {name: (x_key, y_key, companions)}, keys into the payload section.
+    """
+
+    def __init__(self, section, series, method="lttb"):
+        self.section = section
+        self.levels = {}  # (name, level) -> indices
+        for name, (x_key, y_key, _) in series.items():
+            x, y = section.get(x_key) or [], section.get(y_key) or []
+            for level in lod_levels(len(y)):
+                self.levels[(name, level)] = downsample_indices(x, y, level, method)
+        self.series = series
+
+    def view(self, level):
+        """Copy of the section with every series longer than `level` reduced to that level."""
+        out = dict(self.section)
+        for name, (x_key, y_key, companions) in self.series.items():
+            idx = self.levels.get((name, level))
+            if idx is None:
+                continue
+            for key in (x_key, y_key) + tuple(companions):
+                values = self.section.get(key)
+                if values is not None and len(values) == len(self.section[y_key]):
+                    out[key] = [values[i] for i in idx]
+        return out
@@ -4,7 +4,8 @@ import csv       # needed for QUOTE_NONE
 df = pd.read_csv(
     "iac_exoplanet_atmospheres-20251002.csv",
     sep=";",                 # semicolon separator
-    engine="python",         # tolerant parser
+    engine="c",              # fast parser; same result as engine="python" here
+    float_precision="round_trip",
     quoting=csv.QUOTE_NONE,  # treat " as a normal character
     on_bad_lines="skip",     # skip malformed rows (pandas ≥1.3)
     encoding="utf-8"
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# Fields /api/search can filter on (only those present in the CSV are indexed)
+CATEGORICAL_FIELDS = ("type", "planet_status", "observation_type")
+NUMERIC_FIELDS = ("tsm", "esm", "temp_calculated", "radius", "orbital_period", "mass", "star_teff")
+
+def normalize_value(value) -> str:
+    """Case-folded value without the outer quotes QUOTE_NONE keeps ("Hot Jupiter" == hot jupiter)."""
+    text = str(value).strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        text = text[1:-1].strip()
+    return text.casefold()
+
+# ---------- PLANET SEARCH INDEX ----------
+class SearchIndex:
+    """
+    Per-planet indexes for /api/search, built once per data load.
+
+    - categorical field -> value -> sorted planet ids (a planet matches if any
+      of its rows has the value, e.g. any observation_type it was observed with)
+    - molecule -> sorted ids of planets with a detection in any row
+    - numeric field -> planet ids sorted by value (from the planet's first row),
+      so a range is two binary searches
+
+    Queries intersect id arrays; rows are only looked up for the returned page.
+    """
+
+    def __init__(self, store, molecules, meta):
+        self.names = np.array(store.names(), dtype=object)
+        n = len(self.names)
+        row_planet = np.empty(len(store.records), dtype=np.intp)
+        for pid, idx in enumerate(store.offsets.values()):
+            row_planet[idx] = pid
+        self.first_rows = np.array([idx[0] for idx in store.offsets.values()], dtype=np.intp)
+        df = pd.DataFrame.from_records(store.records)
+
+        self.categorical = {}
+        columns = {f: f for f in CATEGORICAL_FIELDS}
+        columns["type"] = meta["type_col"]
+        for field, col in columns.items():
+            if col not in df.columns:
+                continue
+            values = df[col].dropna()
+            pairs = pd.DataFrame({"value": values.map(normalize_value).to_numpy(),
+                                  "pid": row_planet[values.index.to_numpy()]}).drop_duplicates()
+            self.categorical[field] = {v: np.sort(g.to_numpy()) for v, g in pairs.groupby("value")["pid"]}
+
+        detected = np.zeros((n, len(molecules.vocab)), dtype=bool)
+        np.logical_or.at(detected, row_planet, molecules.matrix)
+        self.molecules = {sym.casefold(): np.flatnonzero(detected[:, j]) for j, sym in enumerate(molecules.vocab)}
+
+        self.values = {}   # field -> value per planet id
+        self.numeric = {}  # field -> (sorted values, planet ids in that order), NaNs dropped
+        for field in NUMERIC_FIELDS:
+            if field not in df.columns:
+                continue
+            vals = pd.to_numeric(df[field], errors="coerce").to_numpy(dtype=np.float64)[self.first_rows]
+            order = np.argsort(vals, kind="stable")
+            order = order[~np.isnan(vals[order])]
+            self.values[field] = vals
+            self.numeric[field] = (vals[order], order)
+
+    def __len__(self):
+        return len(self.names)
+
+    def range_ids(self, field, lo=None, hi=None):
+        """Sorted ids of planets with lo <= field <= hi."""
+        sorted_vals, order = self.numeric[field]
+        start = 0 if lo is None else np.searchsorted(sorted_vals, lo, side="left")
+        stop = len(sorted_vals) if hi is None else np.searchsorted(sorted_vals, hi, side="right")
+        return np.sort(order[start:stop])
+
+    def search(self, categorical=None, molecules=(), ranges=None, sort=None, descending=False):
+        """
+        Planet ids matching every clause:
+          categorical: {field: [values]} (any value of a field matches)
+          molecules:   all must be detected
+          ranges:      {field: (lo, hi)}, either bound may be None
+        Ordered by id, or by `sort` (planets without a value last).
+        Unknown fields raise KeyError.
+        """
+        empty = np.empty(0, dtype=np.intp)
+        clauses = []
+        for field, wanted in (categorical or {}).items():
+            index = self.categorical[field]
+            hits = [index.get(normalize_value(v), empty) for v in wanted]
+            clauses.append(np.unique(np.concatenate(hits)) if len(hits) > 1 else hits[0])
+        for mol in molecules:
+            clauses.append(self.molecules.get(mol.strip().casefold(), empty))
+        for field, (lo, hi) in (ranges or {}).items():
+            clauses.append(self.range_ids(field, lo, hi))
+
+        if clauses:
+            clauses.sort(key=len)   # intersect from the most selective clause
+            ids = clauses[0]
+            for other in clauses[1:]:
+                if not len(ids):
+                    break
+                ids = np.intersect1d(ids, other, assume_unique=True)
+        else:
+            ids = np.arange(len(self.names))
+
+        if sort:
+            vals = self.values[sort][ids]
+            order = np.argsort(-vals if descending else vals, kind="stable")  # NaN sorts last
+            ids = ids[order]
+        return ids
@@ -0,0 +1,196 @@
+import sys, time
+import warnings
+import numpy as np
+import pandas as pd
+
+# ---------- CENTERED ROLLING MEDIAN ----------
+# rolling_median(y, w) == pd.Series(y).rolling(w, center=True, min_periods=1).median()
+# element for element: window [i - w//2, i + (w-1)//2] clipped to the array,
+# NaNs ignored, NaN where a window has no values.
+#
+# - w <= SMALL_WINDOW: vectorized NumPy over a sliding-window view
+# - larger w: running median on two indexed heaps, O(n log w), compiled with
+#   numba (imported on first use); without numba, pandas' own skiplist
+
+SMALL_WINDOW = 7  # beyond this the compiled heaps are faster
+_KERNEL = None
+
+def _window_view(y, window):
+    left, right = window // 2, (window - 1) // 2
+    padded = np.concatenate([np.full(left, np.nan), y, np.full(right, np.nan)])
+    return np.lib.stride_tricks.sliding_window_view(padded, window)
+
+def _median_small(y, window):
+    view = _window_view(y, window)
+    left, right = window // 2, (window - 1) // 2
+    if np.isnan(y).any() or len(y) < window:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN windows -> NaN, as pandas
+            return np.nanmedian(view, axis=1)
+    out = np.empty(len(y))
+    out[left:len(y) - right] = np.median(view[left:len(y) - right], axis=1)
+    for i in list(range(left)) + list(range(len(y) - right, len(y))):
+        out[i] = np.median(y[max(0, i - left): i + right + 1])
+    return out
+
+# ---------- TWO-HEAP RUNNING MEDIAN ----------
+# lo is a max-heap of the smaller half, hi a min-heap of the larger half;
+# heaps hold indices into y. where[i] = +(k+1) if y[i] is hi[k], -(k+1) if it
+# is lo[k], 0 if outside the window; that is what makes removal O(log w).
+# sign = +1 sifts hi, -1 sifts lo. Plain Python functions: numba compiles
+# them in _native_kernel, and they also run uncompiled (check_rolling_median).
+
+def _sift_up(heap, where, y, k, sign):
+    item = heap[k]
+    while k > 0:
+        parent = (k - 1) // 2
+        if sign * y[heap[parent]] <= sign * y[item]:
+            break
+        heap[k] = heap[parent]
+        where[heap[k]] = sign * (k + 1)
+        k = parent
+    heap[k] = item
+    where[item] = sign * (k + 1)
+
+def _sift_down(heap, size, where, y, k, sign):
+    item = heap[k]
+    while True:
+        child = 2 * k + 1
+        if child >= size:
+            break
+        if child + 1 < size and sign * y[heap[child + 1]] < sign * y[heap[child]]:
+            child += 1
+        if sign * y[item] <= sign * y[heap[child]]:
+            break
+        heap[k] = heap[child]
+        where[heap[k]] = sign * (k + 1)
+        k = child
+    heap[k] = item
+    where[item] = sign * (k + 1)
+
+def _running_median(y, window, out):
+    n = len(y)
+    left, right = window // 2, (window - 1) // 2
+    lo = np.empty(window + 2, dtype=np.int64)  # one insert ahead of its removal, before rebalancing
+    hi = np.empty(window + 2, dtype=np.int64)
+    where = np.zeros(n, dtype=np.int64)
+    n_lo = 0
+    n_hi = 0
+    for j in range(n + right):
+        # ---- insert y[j] ----
+        if j < n and y[j] == y[j]:
+            if n_lo == 0 or y[j] <= y[lo[0]]:
+                lo[n_lo] = j
+                n_lo += 1
+                _sift_up(lo, where, y, n_lo - 1, -1)
+            else:
+                hi[n_hi] = j
+                n_hi += 1
+                _sift_up(hi, where, y, n_hi - 1, 1)
+        # ---- remove y[j - window] ----
+        old = j - window
+        if old >= 0 and where[old] != 0:
+            k = abs(where[old]) - 1
+            if where[old] < 0:
+                n_lo -= 1
+                if k < n_lo:
+                    lo[k] = lo[n_lo]
+                    _sift_up(lo, where, y, k, -1)
+                    _sift_down(lo, n_lo, where, y, k, -1)
+            else:
+                n_hi -= 1
+                if k < n_hi:
+                    hi[k] = hi[n_hi]
+                    _sift_up(hi, where, y, k, 1)
+                    _sift_down(hi, n_hi, where, y, k, 1)
+            where[old] = 0
+        # ---- rebalance: n_lo == n_hi or n_lo == n_hi + 1 ----
+        if n_lo > n_hi + 1:
+            moved = lo[0]
+            n_lo -= 1
+            lo[0] = lo[n_lo]
+            _sift_down(lo, n_lo, where, y, 0, -1)
+            hi[n_hi] = moved
+            n_hi += 1
+            _sift_up(hi, where, y, n_hi - 1, 1)
+        elif n_hi > n_lo:
+            moved = hi[0]
+            n_hi -= 1
+            hi[0] = hi[n_hi]
+            _sift_down(hi, n_hi, where, y, 0, 1)
+            lo[n_lo] = moved
+            n_lo += 1
+            _sift_up(lo, where, y, n_lo - 1, -1)
+        # ---- emit the median of the window centered on i ----
+        i = j - right
+        if i >= 0:
+            if n_lo == 0:
+                out[i] = np.nan
+            elif n_lo > n_hi:
+                out[i] = y[lo[0]]
+            else:
+                out[i] = (y[lo[0]] + y[hi[0]]) / 2
+    return out
+
+def _native_kernel():
+    """The numba-compiled _running_median, or None when numba is not installed."""
+    global _KERNEL, _sift_up, _sift_down
+    if _KERNEL is None:
+        try:
+            import numba
+        except ImportError:
+            _KERNEL = False
+        else:
+            jit = numba.njit(cache=True, nogil=True)
+            # rebind the helpers first so the compiled kernel calls compiled code
+            _sift_up, _sift_down = jit(_sift_up), jit(_sift_down)
+            _KERNEL = jit(_running_median)
+    return _KERNEL or None
+
+def rolling_median(y, window) -> np.ndarray:
+    """Centered rolling median with min_periods=1 (see the section comment above)."""
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    window = int(window)
+    if window < 1:
+        raise ValueError("window must be >= 1")
+    if len(y) == 0:
+        return y.copy()
+    if window <= SMALL_WINDOW:
+        return _median_small(y, window)
+    kernel = _native_kernel()
+    if kernel is None:
+        return pd.Series(y).rolling(window, center=True, min_periods=1).median().to_numpy()
+    return kernel(y, window, np.empty(len(y)))
+
+# ---------- CHECKS / BENCHMARK ----------
+def check_rolling_median(seed=0):
+    """Compare every path against pandas on random data with ties, NaNs and short inputs."""
+    rng = np.random.RandomState(seed)
+    for n in (0, 1, 2, 7, 40, 333):
+        for window in (1, 2, 3, 4, 5, 16, 17, 31, 64, 500):
+            y = np.round(rng.normal(1.0, 0.01, n), 3)  # rounding creates ties
+            if n > 10:
+                y[rng.rand(n) < 0.05] = np.nan
+            for data in (y, np.nan_to_num(y, nan=1.0)):
+                ref = pd.Series(data).rolling(window, center=True, min_periods=1).median().to_numpy()
+                got = [rolling_median(data, window)]
+                if n:
+                    got.append(_median_small(data, window))
+                    got.append(_running_median(data, window, np.empty(n)))
+                for out in got:
+                    if not np.array_equal(out, ref, equal_nan=True):
+                        print(f"[smoothing] mismatch n={n} window={window}")
+                        return False
+    return True
+
+if __name__ == "__main__":
+    print("parity with pandas:", check_rolling_median())
+    for n in (10**5, 10**6):
+        y = 1.0 + np.random.RandomState(1).normal(0, 6e-4, n)
+        for window in (31, 101, 1001):
+            rolling_median(y[:1000], window)  # compile outside the timing
+            t = time.perf_counter(); out = rolling_median(y, window); ours = time.perf_counter() - t
+            t = time.perf_counter(); ref = pd.Series(y).rolling(window, center=True, min_periods=1).median().to_numpy()
+            theirs = time.perf_counter() - t
+            print(f"n={n:>8} window={window:>5}: {ours*1e3:8.1f} ms  pandas {theirs*1e3:8.1f} ms  equal={np.array_equal(out, ref)}")
+    sys.exit(0)
@@ -0,0 +1,135 @@
+import os, sys, csv, glob, json, shutil, hashlib
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = "snapshot.json"
+SNAPSHOT_FORMAT = 1
+
+# Same semantics as the original engine="python" loader: " is an ordinary
+# character, so cells like "{"H":"Detection"}" are kept verbatim.
+CSV_OPTIONS = dict(sep=";", quoting=csv.QUOTE_NONE, on_bad_lines="skip", encoding="utf-8")
+
+# ---------- CSV PARSE ----------
+def parse_csv(path: str) -> pd.DataFrame:
+    """C-engine parse of the semicolon CSV; falls back to the python engine if the C tokenizer rejects it."""
+    try:
+        # round_trip gives the same float64 bits as the python engine
+        return pd.read_csv(path, engine="c", float_precision="round_trip", **CSV_OPTIONS)
+    except (pd.errors.ParserError, UnicodeDecodeError, ValueError) as e:
+        print(f"[CSV] C engine failed ({e}); using python engine", file=sys.stderr)
+        return pd.read_csv(path, engine="python", **CSV_OPTIONS)
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _stat_key(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+# ---------- COLUMNAR SNAPSHOT ----------
+def _read_manifest(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format") == SNAPSHOT_FORMAT else None
+
+def write_snapshot(df: pd.DataFrame, snapshot_dir, source=None):
+    """
+    One .npy per column plus snapshot.json. Numeric columns are stored with
+    their dtype; text columns as fixed-width unicode plus a missing-value mask.
+    """
+    tmp_dir = f"{snapshot_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    columns = []
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        entry = {"name": col, "file": f"col{i}.npy", "dtype": str(s.dtype)}
+        if pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+            np.save(os.path.join(tmp_dir, entry["file"]), s.to_numpy())
+            entry["kind"] = "numeric"
+        else:
+            mask = s.isna().to_numpy()
+            values = s.astype(object).where(~mask, "").astype(str).to_numpy(dtype=str)
+            np.save(os.path.join(tmp_dir, entry["file"]), values)
+            np.save(os.path.join(tmp_dir, f"col{i}_na.npy"), mask)
+            entry["kind"] = "text"
+        columns.append(entry)
+
+    manifest = {"format": SNAPSHOT_FORMAT, "rows": len(df), "columns": columns, "source": source or {}}
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, snapshot_dir)
+    except OSError:
+        # another worker published the same snapshot first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return manifest
+
+def read_snapshot(snapshot_dir, manifest=None) -> pd.DataFrame:
+    """Rebuild the DataFrame; numeric columns are memory-mapped, text columns are materialized."""
+    manifest = manifest or _read_manifest(snapshot_dir)
+    data = {}
+    for entry in manifest["columns"]:
+        arr = np.load(os.path.join(snapshot_dir, entry["file"]), mmap_mode="r")
+        if entry["kind"] == "numeric":
+            data[entry["name"]] = pd.Series(arr, dtype=entry["dtype"], copy=False)
+        else:
+            mask = np.load(os.path.join(snapshot_dir, entry["file"].replace(".npy", "_na.npy")))
+            values = arr.astype(object)
+            values[mask] = np.nan
+            data[entry["name"]] = pd.Series(values, dtype=object if entry["dtype"] == "object" else entry["dtype"])
+    # copy=False: a dict of Series is copied by default, which would drop the memory maps
+    return pd.DataFrame(data, copy=False)
+
+def load_table(csv_path, snapshot_dir, parse=parse_csv) -> pd.DataFrame:
+    """
+    The catalogue as a DataFrame, from the snapshot when it matches the CSV.
+
+    A changed mtime/size alone only triggers a sha256 of the CSV; the file is
+    re-parsed (and the snapshot rewritten) only if its content changed.
+    """
+    stat = _stat_key(csv_path)
+    manifest = _read_manifest(snapshot_dir)
+    source = manifest["source"] if manifest else {}
+    if manifest is not None and source.get("path") == os.path.abspath(csv_path):
+        if source.get("stat") == stat:
+            return read_snapshot(snapshot_dir, manifest)
+        sha = file_sha256(csv_path)
+        if source.get("sha256") == sha:
+            source["stat"] = stat
+            try:
+                with open(os.path.join(snapshot_dir, MANIFEST_FILE), "w") as f:
+                    json.dump(manifest, f)
+            except OSError:
+                pass
+            return read_snapshot(snapshot_dir, manifest)
+    else:
+        sha = file_sha256(csv_path)
+
+    df = parse(csv_path)
+    source = {"path": os.path.abspath(csv_path), "stat": stat, "sha256": sha}
+    try:
+        write_snapshot(df, snapshot_dir, source)
+        print(f"[CSV] snapshot written to {snapshot_dir}", file=sys.stderr)
+    except OSError as e:
+        print(f"[CSV] snapshot not written: {e}", file=sys.stderr)
+    return df
+
+# ---------- INGEST CLI ----------
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    path = sys.argv[1] if len(sys.argv) > 1 else sorted(glob.glob(os.path.join(here, "*.csv")))[0]
+    out = sys.argv[2] if len(sys.argv) > 2 else os.path.join(here, "snapshot")
+    shutil.rmtree(out, ignore_errors=True)
+    df = load_table(path, out)
+    check = read_snapshot(out)
+    pd.testing.assert_frame_equal(check, parse_csv(path), check_exact=True)
+    print(f"✅ {path}: {df.shape[0]} rows x {df.shape[1]} columns -> {out} (verified)")
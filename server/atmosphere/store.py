@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+# ---------- INDEXED PLANET STORE ----------
+class PlanetStore:
+    """
+    Startup-time index over the catalogue DataFrame.
+
+    - planet name -> row offsets (hash map, O(1) lookup)
+    - first row of each planet as a plain dict (what /api/data reads)
+    - series columns (time/brightness/wavelength/morning/evening) coerced
+      once to float64 arrays, so requests slice arrays instead of building
+      and converting a sub-DataFrame.
+    """
+
+    def __init__(self, df: pd.DataFrame, meta: dict):
+        self.meta = meta
+        names = df[meta["planet_col"]].astype(str)
+        self.offsets = {name: idx for name, idx in names.groupby(names, sort=False).indices.items()}
+        self.records = df.to_dict("records")
+
+        series_cols = [meta.get(k) for k in ("time_col", "bright_col", "wave_col", "morning_col", "evening_col")]
+        self.numeric = {
+            c: pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64)
+            for c in dict.fromkeys(series_cols) if c and c in df.columns
+        }
+
+    def __contains__(self, planet):
+        return str(planet) in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def names(self):
+        return list(self.offsets)
+
+    def rows(self, planet) -> np.ndarray:
+        return self.offsets.get(str(planet), np.empty(0, dtype=np.intp))
+
+    def first_row(self, planet) -> dict:
+        idx = self.rows(planet)
+        return self.records[idx[0]] if len(idx) else {}
+
+    def has_series(self, xcol, ycol) -> bool:
+        return bool(xcol and ycol and xcol in self.numeric and ycol in self.numeric)
+
+    def series(self, planet, xcol, ycol):
+        """(x, y) for one planet: rows where both are numeric, sorted by x (as sort_values does)."""
+        idx = self.rows(planet)
+        x = self.numeric[xcol][idx]
+        y = self.numeric[ycol][idx]
+        keep = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[keep], y[keep]
+        order = np.argsort(x, kind="quicksort")
+        return x[order], y[order]
+
+# ---------- MOLECULE DETECTION MATRIX ----------
+class MoleculeMatrix:
+    """
+    The molecules column parsed once into a (rows x vocabulary) boolean
+    detection matrix. The vocabulary is sorted, so a row's set columns come
+    back in the same order parse() returns them.
+    """
+
+    def __init__(self, cells, parse, known=()):
+        parsed = [parse(c) for c in cells]
+        self.vocab = sorted(set(known).union(*parsed))
+        self.col = {sym: j for j, sym in enumerate(self.vocab)}
+        self.matrix = np.zeros((len(parsed), len(self.vocab)), dtype=bool)
+        for i, syms in enumerate(parsed):
+            self.matrix[i, [self.col[s] for s in syms]] = True
+        self._vocab = np.array(self.vocab, dtype=object)
+
+    def detected(self, rows) -> list:
+        """Detected symbols of the first of `rows` (a planet's row offsets)."""
+        if not len(rows):
+            return []
+        return self._vocab[self.matrix[rows[0]]].tolist()
+
+    def counts(self, rows=None) -> dict:
+        """Detections per molecule over `rows` (default: every row)."""
+        m = self.matrix if rows is None else self.matrix[rows]
+        return dict(zip(self.vocab, m.sum(axis=0).tolist()))
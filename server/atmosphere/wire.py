@@ -0,0 +1,95 @@
+import json, base64, struct
+import numpy as np
+
+# ---------- /api/data WIRE FORMATS ----------
+# json     application/json                     default, float lists as-is
+# compact  application/vnd.exo.compact+json     float arrays as base64 little-endian float32
+# binary   application/vnd.exo.binary           header JSON + raw little-endian float32 buffers
+#
+# In compact and binary, every float list of the payload is replaced by
+# {"$ref": key} and stored once under "arrays" -> key, so the shared
+# wavelength grid is sent a single time. key is the dotted path of the
+# first occurrence, e.g. "spectra.wavelength_morning".
+#
+# Binary layout: b"EXOB" | uint32 LE header length | header JSON (space-padded
+# to a multiple of 4) | buffers. Each header "arrays" entry has the byte
+# offset of its buffer from the start of the buffer section.
+
+MIMETYPES = {
+    "json": "application/json",
+    "compact": "application/vnd.exo.compact+json",
+    "binary": "application/vnd.exo.binary",
+}
+BINARY_MAGIC = b"EXOB"
+MIN_ARRAY_LEN = 8  # shorter lists (e.g. label coordinates) stay inline
+WIRE_DTYPE = np.dtype("<f4")
+
+def _is_float_list(value):
+    return (isinstance(value, list) and len(value) >= MIN_ARRAY_LEN
+            and all(isinstance(v, float) for v in value))
+
+def extract_arrays(payload):
+    """(payload with float lists replaced by {"$ref": key}, {key: float32 array}); equal lists share one key."""
+    arrays, seen = {}, {}
+
+    def walk(value, path):
+        if isinstance(value, dict):
+            return {k: walk(v, f"{path}.{k}" if path else k) for k, v in value.items()}
+        if _is_float_list(value):
+            arr = np.asarray(value, dtype=WIRE_DTYPE)
+            digest = arr.tobytes()
+            key = seen.get(digest)
+            if key is None:
+                key = seen[digest] = path
+                arrays[key] = arr
+            return {"$ref": key}
+        if isinstance(value, list):
+            return [walk(v, f"{path}.{i}") for i, v in enumerate(value)]
+        return value
+
+    return walk(payload, ""), arrays
+
+def encode_compact(payload, dumps=json.dumps):
+    body, arrays = extract_arrays(payload)
+    body["arrays"] = {
+        key: {"dtype": WIRE_DTYPE.str, "shape": list(arr.shape), "data": base64.b64encode(arr.tobytes()).decode("ascii")}
+        for key, arr in arrays.items()
+    }
+    return dumps(body).encode("utf-8")
+
+def encode_binary(payload, dumps=json.dumps):
+    body, arrays = extract_arrays(payload)
+    offset, directory = 0, {}
+    for key, arr in arrays.items():
+        directory[key] = {"dtype": WIRE_DTYPE.str, "shape": list(arr.shape), "offset": offset}
+        offset += arr.nbytes
+    body["arrays"] = directory
+    header = dumps(body).encode("utf-8")
+    header += b" " * (-(len(BINARY_MAGIC) + 4 + len(header)) % 4)  # keep buffers 4-byte aligned
+    return b"".join([BINARY_MAGIC, struct.pack("<I", len(header)), header] + [a.tobytes() for a in arrays.values()])
+
+def decode(data, fmt):
+    """Inverse of the encoders (float32 values as Python floats); used by clients and checks."""
+    if fmt == "binary":
+        assert data[:4] == BINARY_MAGIC
+        (n,) = struct.unpack("<I", data[4:8])
+        body = json.loads(data[8:8 + n])
+        start = 8 + n
+        arrays = {k: np.frombuffer(data, dtype=a["dtype"], count=int(np.prod(a["shape"])), offset=start + a["offset"])
+                  for k, a in body.pop("arrays").items()}
+    else:
+        body = json.loads(data)
+        if fmt == "json":
+            return body
+        arrays = {k: np.frombuffer(base64.b64decode(a["data"]), dtype=a["dtype"]) for k, a in body.pop("arrays").items()}
+
+    def walk(value):
+        if isinstance(value, dict):
+            if set(value) == {"$ref"}:
+                return arrays[value["$ref"]].astype(np.float64).tolist()
+            return {k: walk(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [walk(v) for v in value]
+        return value
+
+    return walk(body)
@@ -0,0 +1,275 @@
+"""
+Offline benchmarks for the classifier and atmosphere services.
+
+    python bench.py run [--out bench_baseline.json] [--modes testclient,wsgi] [--repeat 200]
+    python bench.py compare bench_baseline.json [--current run.json] [--threshold 0.25]
+
+Each service is measured in its own subprocess (both apps are called
+`app`), from its own directory, through Flask's test client and through a
+local threaded WSGI server (werkzeug) over HTTP. Recorded per scenario:
+p50/p95/p99 latency (ms) and throughput (req/s); per service: import
+(startup) time, first-request time and RSS. `compare` re-runs (or reads
+--current) and exits with status 1 if any metric regressed by more than
+the threshold.
+"""
+import os, sys, io, json, time, argparse, threading, subprocess, contextlib
+import urllib.request, urllib.parse
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVICES = ("classifier", "atmosphere")
+MODES = ("testclient", "wsgi")
+
+# ---------- MEASUREMENT HELPERS ----------
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def summarize(latencies, wall):
+    ms = np.asarray(latencies) * 1e3
+    return {
+        "n": int(ms.size),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "throughput_rps": float(ms.size / wall) if wall > 0 else 0.0,
+    }
+
+class TestClientTransport:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, query=None, form=None, json_body=None):
+        resp = self.client.open(path, method=method, query_string=query, data=form, json=json_body)
+        if resp.status_code >= 500:
+            raise RuntimeError(f"{method} {path} -> {resp.status_code}")
+        return resp.data
+
+class WSGITransport:
+    """werkzeug's threaded dev server on an ephemeral port, driven over HTTP."""
+
+    def __init__(self, flask_app):
+        from werkzeug.serving import make_server
+        self.server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def request(self, method, path, query=None, form=None, json_body=None):
+        url = self.base + path + ("?" + urllib.parse.urlencode(query, doseq=True) if query else "")
+        data, headers = None, {}
+        if json_body is not None:
+            data, headers = json.dumps(json_body).encode(), {"Content-Type": "application/json"}
+        elif form is not None:
+            data, headers = urllib.parse.urlencode(form).encode(), {"Content-Type": "application/x-www-form-urlencoded"}
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers, method=method)) as resp:
+            return resp.read()
+
+    def close(self):
+        self.server.shutdown()
+
+def run_scenario(transport, requests):
+    latencies = []
+    start = time.perf_counter()
+    for req in requests:
+        t = time.perf_counter()
+        transport.request(**req)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start)
+
+# ---------- SCENARIOS ----------
+def classifier_scenarios(app_module, repeat):
+    rng = np.random.RandomState(0)
+    sliders = app_module.sliders
+
+    def random_form():
+        return {f: str(rng.uniform(sliders[f]["min"], sliders[f]["max"])) for f in app_module.FEATURES}
+
+    default = {f: str(sliders[f]["default"]) for f in app_module.FEATURES}
+    batch = [{f: float(v) for f, v in random_form().items()} for _ in range(100)]
+    return {
+        "predict_random": [dict(method="POST", path="/predict", form=random_form()) for _ in range(repeat)],
+        "predict_repeated": [dict(method="POST", path="/predict", form=default) for _ in range(repeat)],
+        "predict_batch_100": [dict(method="POST", path="/predict_batch", json_body={"rows": batch})
+                              for _ in range(max(1, repeat // 10))],
+    }
+
+def atmosphere_scenarios(app_module, repeat):
+    types = list(app_module.TYPE_CACHE["mapping"])
+    planets = app_module.STORE.names()
+    all_planets = [dict(method="GET", path="/api/data", query={"planet": p}) for p in planets]
+    return {
+        "types": [dict(method="GET", path="/api/types") for _ in range(repeat)],
+        "planets": [dict(method="GET", path="/api/planets", query={"type": types[i % len(types)]}) for i in range(repeat)],
+        "data_all_planets_cold": all_planets,
+        "data_all_planets_warm": all_planets,
+    }
+
+SCENARIOS = {"classifier": classifier_scenarios, "atmosphere": atmosphere_scenarios}
+
+def worker(service, modes, repeat, out_path):
+    """Runs inside the service directory: import, measure, write JSON to out_path."""
+    sys.path.insert(0, os.getcwd())
+    result = {"service": service, "rss_before_mb": rss_mb()}
+    quiet = io.StringIO()  # the apps print per request; keep that out of the timings' stdout
+    with contextlib.redirect_stdout(quiet):
+        start = time.perf_counter()
+        import app as app_module
+        result["startup_s"] = time.perf_counter() - start
+        result["rss_after_import_mb"] = rss_mb()
+        scenarios = SCENARIOS[service](app_module, repeat)
+        for mode in modes:
+            transport = TestClientTransport(app_module.app) if mode == "testclient" else WSGITransport(app_module.app)
+            if service == "atmosphere":
+                app_module.DATA_CACHE.clear()  # so the cold pass is cold in every mode
+            result[mode] = {}
+            for name, reqs in scenarios.items():
+                if not name.endswith("_cold"):
+                    # untimed first call: lazy model loads / compiles land in first_request_ms instead
+                    t = time.perf_counter()
+                    transport.request(**reqs[0])
+                    result.setdefault("first_request_ms", (time.perf_counter() - t) * 1e3)
+                result[mode][name] = run_scenario(transport, reqs)
+            if mode == "wsgi":
+                transport.close()
+    result["rss_peak_mb"] = rss_mb()
+    with open(out_path, "w") as f:
+        json.dump(result, f)
+
+def run_service(service, modes, repeat):
+    out_path = os.path.join(HERE, f".bench_{service}_{os.getpid()}.json")
+    cmd = [sys.executable, os.path.abspath(__file__), "_worker", service,
+           "--modes", ",".join(modes), "--repeat", str(repeat), "--out", out_path]
+    proc = subprocess.run(cmd, cwd=os.path.join(HERE, service), capture_output=True, text=True)
+    try:
+        with open(out_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"service": service, "error": (proc.stderr or proc.stdout).strip().splitlines()[-5:]}
+    finally:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+
+def run_all(services, modes, repeat):
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+               "repeat": repeat, "services": {}}
+    for service in services:
+        print(f"[bench] {service} ...", flush=True)
+        results["services"][service] = run_service(service, modes, repeat)
+    return results
+
+# ---------- REPORT / COMPARE ----------
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "startup_s", "first_request_ms", "rss_after_import_mb", "rss_peak_mb")
+HIGHER_IS_BETTER = ("throughput_rps",)
+
+def flatten(results):
+    """{"service.mode.scenario.metric": value} for every comparable metric."""
+    flat = {}
+    for service, res in results["services"].items():
+        for key in ("startup_s", "first_request_ms", "rss_after_import_mb", "rss_peak_mb"):
+            if key in res:
+                flat[f"{service}.{key}"] = res[key]
+        for mode in MODES:
+            for scenario, stats in res.get(mode, {}).items():
+                for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+                    if metric in stats:
+                        flat[f"{service}.{mode}.{scenario}.{metric}"] = stats[metric]
+    return flat
+
+def print_report(results):
+    for service, res in results["services"].items():
+        if "error" in res:
+            print(f"{service}: ERROR {res['error']}")
+            continue
+        print(f"{service}: startup {res['startup_s']:.2f} s, first request {res.get('first_request_ms', 0):.0f} ms, "
+              f"RSS {res['rss_after_import_mb']:.0f} MB (peak {res['rss_peak_mb']:.0f} MB)")
+        for mode in MODES:
+            for scenario, s in res.get(mode, {}).items():
+                print(f"  {mode:>10} {scenario:<24} p50 {s['p50_ms']:7.2f}  p95 {s['p95_ms']:7.2f}  "
+                      f"p99 {s['p99_ms']:7.2f} ms  {s['throughput_rps']:8.1f} req/s")
+
+def compare(baseline, current, threshold, min_delta_ms=1.0):
+    """
+    List of (metric, baseline, current, change) that regressed by more than
+    threshold. Latencies must also be min_delta_ms worse, so sub-millisecond
+    jitter in the tails does not fail the gate.
+    """
+    base, cur = flatten(baseline), flatten(current)
+    regressions = []
+    for key, b in base.items():
+        if key not in cur or not b:
+            continue
+        c = cur[key]
+        change = (c - b) / b
+        metric = key.rsplit(".", 1)[-1]
+        if metric.endswith("_ms") and c - b < min_delta_ms:
+            continue
+        if (metric in LOWER_IS_BETTER and change > threshold) or (metric in HIGHER_IS_BETTER and -change > threshold):
+            regressions.append((key, b, c, change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Flask services and gate on regressions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "compare", "_worker"):
+        p = sub.add_parser(name)
+        p.add_argument("--modes", default=",".join(MODES))
+        p.add_argument("--repeat", type=int, default=200, help="requests per repeated scenario")
+        if name == "_worker":
+            p.add_argument("service", choices=SERVICES)
+            p.add_argument("--out", required=True)
+        else:
+            p.add_argument("--services", default=",".join(SERVICES))
+        if name == "run":
+            p.add_argument("--out", default=os.path.join(HERE, "bench_baseline.json"))
+        if name == "compare":
+            p.add_argument("baseline")
+            p.add_argument("--current", help="compare this saved run instead of running now")
+            p.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+            p.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+            p.add_argument("--save", help="also write the new run here")
+    args = parser.parse_args()
+    modes = [m for m in args.modes.split(",") if m]
+
+    if args.command == "_worker":
+        worker(args.service, modes, args.repeat, args.out)
+        return 0
+
+    services = [s for s in args.services.split(",") if s]
+    if args.command == "run":
+        results = run_all(services, modes, args.repeat)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print_report(results)
+        print(f"✅ baseline written to {args.out}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_all(services, modes, baseline.get("repeat", args.repeat))
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(current, f, indent=2)
+    print_report(current)
+    errors = [s for s, res in current["services"].items() if "error" in res]
+    regressions = compare(baseline, current, args.threshold, args.min_delta_ms)
+    for key, b, c, change in regressions:
+        print(f"REGRESSION {key}: {b:.3f} -> {c:.3f} ({change:+.0%})")
+    if regressions or errors:
+        print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}, {len(errors)} failed service(s)")
+        return 1
+    print(f"✅ no regression beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
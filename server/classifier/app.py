@@ -1,10 +1,15 @@
 # app.py
 
-from flask import Flask, render_template, request, flash
+from flask import Flask, render_template, request, flash, jsonify
 import pandas as pd
 import numpy as np
-import joblib
 import os
+import io
+from loader import LazyModels
+from registry import ModelRegistry
+from cache import PredictionCache
+from grid import ProbabilityGrid
+from bls import bls_search, classifier_inputs, period_grid, DEFAULT_DURATIONS
 
 # -----------------------------
 # Paths and Config
@@ -14,6 +19,18 @@ MODEL_DIR = os.path.join(BASE_DIR, "models")
 FEATURES = ["orbital_period", "transit_depth", "planet_radius", "stellar_radius"]
 EPSILON = 1e-6
 
+# Inference backend: "forest" (flattened native tree engine), "sklearn" (model wrappers)
+# or "grid" (interpolated lookup in the precomputed grid from grid.py, forest otherwise)
+INFERENCE_BACKEND = os.environ.get("EXO_INFERENCE_BACKEND", "forest")
+FOREST_MAX_ROWS = int(os.environ.get("EXO_FOREST_MAX_ROWS", "256"))  # larger batches use the wrappers
+FOREST_N_JOBS = int(os.environ.get("EXO_FOREST_N_JOBS", "1"))
+PREDICTION_CACHE_SIZE = int(os.environ.get("EXO_PREDICTION_CACHE_SIZE", "4096"))
+MODEL_CHECK_INTERVAL = float(os.environ.get("EXO_MODEL_CHECK_INTERVAL", "2.0"))  # seconds between models/ polls
+BLS_N_JOBS = int(os.environ.get("EXO_BLS_N_JOBS", str(os.cpu_count() or 1)))  # threads per /bls search
+BLS_MAX_PERIODS = int(os.environ.get("EXO_BLS_MAX_PERIODS", "200000"))  # larger trial grids are rejected
+
+CLASS_MAP = {0: "False Positive", 1: "Candidate", 2: "Confirmed"}
+
 # Physical features (not scaled)
 PHYSICAL_FEATURES = [
     "orbital_period", "transit_duration", "transit_depth",
@@ -22,13 +39,58 @@ PHYSICAL_FEATURES = [
     "stellar_mass", "stellar_temp", "stellar_logg", "stellar_metallicity"
 ]
 
+# Placeholder values for the features the UI does not collect. Only used with
+# artifact sets that predate models/feature_transform.json; with it, they are
+# imputed with the training medians (features.FeatureTransformer).
+PLACEHOLDER_FEATURES = {
+    "transit_duration": 1.0,
+    "eccentricity": 0.0,
+    "impact_parameter": 0.5,
+    "eq_temperature": 1.0,
+    "semi_major_axis": 1.0,
+    "stellar_mass": 1.0,
+    "stellar_temp": 5800.0,
+    "stellar_logg": 4.44,
+    "stellar_metallicity": 0.0,
+}
+
 # -----------------------------
 # Load models, scaler, feature columns
 # -----------------------------
-lgb_model = joblib.load(os.path.join(MODEL_DIR, "lightgbm_model.pkl"))
-xgb_model = joblib.load(os.path.join(MODEL_DIR, "xgboost_model.pkl"))
-scaler = joblib.load(os.path.join(MODEL_DIR, "scaler.pkl"))
-feature_cols = joblib.load(os.path.join(MODEL_DIR, "feature_cols.pkl"))
+# Loaded lazily: serving reads the memory-mapped flat forest and scaler stats
+# compiled into models/compiled/<version>/; lightgbm, xgboost and sklearn are
+# only imported when a wrapper model is needed (sklearn backend, large batches).
+# The registry versions the artifact set by checksum and hot-swaps it when
+# the files in models/ change.
+registry = ModelRegistry(
+    MODEL_DIR,
+    lambda checksums: LazyModels(MODEL_DIR, FEATURES, PHYSICAL_FEATURES, PLACEHOLDER_FEATURES,
+                                 use_forest=INFERENCE_BACKEND in ("forest", "grid"), checksums=checksums),
+    check_interval=MODEL_CHECK_INTERVAL,
+)
+registry.reload(preload=False)
+
+def __getattr__(name):
+    # app.lgb_model, app.scaler, app.feature_plan, ... resolve through the serving version
+    if name in ("lgb_model", "xgb_model", "scaler", "feature_cols", "feature_plan", "flat_forest", "transform"):
+        return getattr(registry.current, name)
+    raise AttributeError(name)
+
+def preload_models():
+    """Load everything before workers fork (called from gunicorn.conf.py or EXO_PRELOAD_MODELS=1)."""
+    registry.current.preload()
+
+if os.environ.get("EXO_PRELOAD_MODELS") == "1":
+    preload_models()
+
+# Precomputed probability grid (memory-mapped), built offline with `python grid.py`
+probability_grid = None
+if INFERENCE_BACKEND == "grid":
+    try:
+        probability_grid = ProbabilityGrid.load(MODEL_DIR)
+        print(f"[grid] serving from {probability_grid.probs.shape} grid, error vs models: {probability_grid.error}")
+    except (OSError, KeyError) as e:
+        print(f"[grid] not available, using the models: {e}")
 
 # -----------------------------
 # Flask App
@@ -44,22 +106,34 @@ sliders = {
     "stellar_radius": {"min": 0.5, "max": 2, "default": 1.05, "step": 0.00001, "unit": "R☉"},
 }
 
+# LRU of ensemble probabilities for repeated slider positions
+prediction_cache = PredictionCache(sliders, maxsize=PREDICTION_CACHE_SIZE)
+
 # -----------------------------
 # Feature Engineering for Prediction
 # -----------------------------
 def create_features(user_input):
-    df = pd.DataFrame([user_input])
+    models = registry.current
+
+    # DataFrame view of the model features. With a fitted feature transform
+    # this is the same single pass training applied (features.py); the code
+    # below is the placeholder pipeline for older artifact sets, which the
+    # hot path's feature_plan is checked bit-for-bit against.
+    # Accepts a single input dict, a list of dicts or a DataFrame of N rows;
+    # every step below is column-wise so N rows cost one pass.
+    if isinstance(user_input, pd.DataFrame):
+        df = user_input[FEATURES].astype(float).reset_index(drop=True)
+    elif isinstance(user_input, dict):
+        df = pd.DataFrame([user_input])
+    else:
+        df = pd.DataFrame(list(user_input))
+
+    if models.transform is not None:
+        return models.transform.transform_frame(df[FEATURES])
 
     # Placeholder features (unknown inputs)
-    df["transit_duration"] = 1.0
-    df["eccentricity"] = 0.0
-    df["impact_parameter"] = 0.5
-    df["eq_temperature"] = 1.0
-    df["semi_major_axis"] = 1.0
-    df["stellar_mass"] = 1.0
-    df["stellar_temp"] = 5800.0
-    df["stellar_logg"] = 4.44
-    df["stellar_metallicity"] = 0.0
+    for col, value in PLACEHOLDER_FEATURES.items():
+        df[col] = value
 
     # Derived features
     df["transit_snr"] = df["transit_depth"] / (df["transit_duration"] + EPSILON)
@@ -70,6 +144,7 @@ def create_features(user_input):
     df["log_orbital_period"] = np.log1p(df["orbital_period"])
 
     # Ensure all training columns exist
+    feature_cols = models.feature_cols
     for col in feature_cols:
         if col not in df.columns:
             df[col] = 0
@@ -80,10 +155,51 @@ def create_features(user_input):
     # Scale only derived features (non-physical)
     derived_cols = [c for c in feature_cols if c not in PHYSICAL_FEATURES]
     if derived_cols:
-        df[derived_cols] = scaler.transform(df[derived_cols])
+        df[derived_cols] = models.scaler.transform(df[derived_cols])
 
     return df
 
+# -----------------------------
+# Ensemble Prediction
+# -----------------------------
+def predict_ensemble(rows, use_grid=False, models=None):
+    """
+    Score N input rows with one feature pass and one predict_proba per model.
+    `models` pins a registry version; by default the current one is used.
+    use_grid (the /predict sliders only) answers rows inside the precomputed
+    grid by interpolation; rows outside it are still scored by the models.
+    """
+    models = models or registry.current
+    raw = models.feature_plan.input_array(rows)
+
+    def score(raw_rows):
+        X = models.feature_plan.transform(raw_rows)
+        return models.predict_proba(X, forest_max_rows=FOREST_MAX_ROWS, n_jobs=FOREST_N_JOBS)
+
+    if use_grid and probability_grid is not None and probability_grid.version == models.version:
+        return probability_grid.predict_proba(raw, fallback=score)
+    return score(raw)
+
+def parse_batch_request(req):
+    """Read batch rows from a CSV upload, a text/csv body or a JSON payload."""
+    if "file" in req.files:
+        df = pd.read_csv(req.files["file"])
+    elif req.mimetype == "text/csv":
+        df = pd.read_csv(io.StringIO(req.get_data(as_text=True)))
+    else:
+        payload = req.get_json(force=True, silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get("rows", [])
+        if not isinstance(payload, list):
+            raise ValueError("Expected a JSON list of rows or {\"rows\": [...]}")
+        df = pd.DataFrame(payload)
+
+    df.columns = [str(c).strip() for c in df.columns]
+    missing = [f for f in FEATURES if f not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    return df[FEATURES].apply(pd.to_numeric, errors="raise")
+
 # -----------------------------
 # Routes
 # -----------------------------
@@ -97,22 +213,25 @@ def predict():
         # Collect user input
         user_input = {f: float(request.form[f]) for f in FEATURES}
 
-        # Prepare feature DataFrame
-        X = create_features(user_input)
+        # Same vectorized path as /predict_batch, with a batch of one,
+        # memoized on the inputs rounded to the slider steps
+        models = registry.current
+        ensemble_probs = prediction_cache.get_or_compute(
+            user_input, lambda: predict_ensemble([user_input], use_grid=True, models=models), version=models.version
+        )
+        pred_class_index = int(np.argmax(ensemble_probs[0]))
 
-        # Model predictions
-        lgb_probs = lgb_model.predict_proba(X)
-        xgb_probs = xgb_model.predict_proba(X)
-        ensemble_probs = (lgb_probs + xgb_probs) / 2
-        pred_class_index = int(np.argmax(ensemble_probs))
-        
         # Map classes to labels
-        class_map = {0: "False Positive", 1: "Candidate", 2: "Confirmed"}
-        pred_class = class_map.get(pred_class_index, str(pred_class_index))
+        pred_class = CLASS_MAP.get(pred_class_index, str(pred_class_index))
 
         # Prepare probability display
-        prob_display = {class_map[i]: round(float(p)*100, 2) for i, p in enumerate(ensemble_probs[0])}
-        inference = "Exoplanet classification result based on ensemble of LightGBM and XGBoost models."
+        prob_display = {CLASS_MAP[i]: round(float(p)*100, 2) for i, p in enumerate(ensemble_probs[0])}
+        member_names = {"lightgbm": "LightGBM", "xgboost": "XGBoost"}
+        inference = (
+            "Exoplanet classification result based on ensemble of "
+            + " and ".join(member_names[m] for m in models.members)
+            + f" models (model version {models.version})."
+        )
 
         # Pass ensemble_probs and user_input for chart visualization
         return render_template(
@@ -128,6 +247,115 @@ def predict():
         flash(str(e), "danger")
         return render_template("index.html", sliders=sliders)
 
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """Score many candidates per call (JSON rows or CSV with the FEATURES columns)."""
+    try:
+        rows = parse_batch_request(request)
+    except Exception as e:
+        return jsonify({"error": str(e), "success": False}), 400
+
+    try:
+        models = registry.current
+        ensemble_probs = predict_ensemble(rows, models=models) if not rows.empty else np.empty((0, len(CLASS_MAP)))
+    except Exception as e:
+        return jsonify({"error": str(e), "success": False}), 503
+    pred_idx = np.argmax(ensemble_probs, axis=1)
+
+    predictions = [
+        {
+            "pred_class": CLASS_MAP.get(int(k), str(int(k))),
+            "probabilities": {CLASS_MAP[i]: float(p) for i, p in enumerate(probs)},
+        }
+        for k, probs in zip(pred_idx, ensemble_probs)
+    ]
+    return jsonify({
+        "count": len(predictions),
+        "classes": list(CLASS_MAP.values()),
+        "predictions": predictions,
+        "model_version": models.version,
+        "success": True
+    })
+
+def parse_light_curve_request(req):
+    """(time, flux, flux_err or None, options) from a CSV upload, a text/csv body or a JSON payload."""
+    payload = {}
+    if "file" in req.files:
+        df = pd.read_csv(req.files["file"])
+    elif req.mimetype == "text/csv":
+        df = pd.read_csv(io.StringIO(req.get_data(as_text=True)))
+    else:
+        payload = req.get_json(force=True, silent=True)
+        if not isinstance(payload, dict):
+            raise ValueError("Expected {\"time\": [...], \"flux\": [...]} or a CSV with time,flux columns")
+        df = pd.DataFrame({k: payload[k] for k in ("time", "flux", "flux_err") if k in payload})
+
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    missing = [c for c in ("time", "flux") if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    options = {**req.args.to_dict(), **req.form.to_dict(), **{k: v for k, v in payload.items() if k not in df.columns}}
+    flux_err = df["flux_err"].to_numpy(float) if "flux_err" in df.columns else None
+    return df["time"].to_numpy(float), df["flux"].to_numpy(float), flux_err, options
+
+@app.route("/bls", methods=["POST"])
+def bls():
+    """
+    Box Least Squares transit search on an uploaded light curve (time in days,
+    relative flux). Options: min_period, max_period, durations (days, comma
+    separated). With planet_radius and stellar_radius the detected period and
+    depth are also classified.
+    """
+    try:
+        t, flux, flux_err, options = parse_light_curve_request(request)
+        durations = options.get("durations", DEFAULT_DURATIONS)
+        if isinstance(durations, str):
+            durations = [float(d) for d in durations.split(",") if d.strip()]
+        min_period = float(options["min_period"]) if options.get("min_period") else None
+        max_period = float(options["max_period"]) if options.get("max_period") else None
+        radii = None
+        if options.get("planet_radius") and options.get("stellar_radius"):
+            try:
+                radii = {k: float(options[k]) for k in ("planet_radius", "stellar_radius")}
+            except (TypeError, ValueError):
+                radii = None
+            if radii is None or not all(np.isfinite(v) and v > 0 for v in radii.values()):
+                raise ValueError("planet_radius and stellar_radius must be positive numbers")
+        periods = period_grid(t[np.isfinite(t)], durations, min_period, max_period, max_periods=BLS_MAX_PERIODS)
+        result = bls_search(t, flux, flux_err, periods=periods, durations=durations, n_jobs=BLS_N_JOBS)
+    except Exception as e:
+        return jsonify({"error": str(e), "success": False}), 400
+
+    response = {**result, "classifier_inputs": classifier_inputs(result), "success": True}
+    if radii is not None:
+        row = {**response["classifier_inputs"], **radii}
+        try:
+            models = registry.current
+            probs = predict_ensemble([row], models=models)[0]
+        except Exception as e:
+            return jsonify({"error": str(e), "success": False}), 503
+        response["prediction"] = {
+            "pred_class": CLASS_MAP.get(int(np.argmax(probs)), str(int(np.argmax(probs)))),
+            "probabilities": {CLASS_MAP[i]: float(p) for i, p in enumerate(probs)},
+            "model_version": models.version,
+        }
+    return jsonify(response)
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+@app.route("/models", methods=["GET"])
+def model_status():
+    """Serving model version, its members and artifact checksums, and the swap history."""
+    return jsonify(registry.status())
+
+@app.route("/models/reload", methods=["POST"])
+def model_reload():
+    """Re-checksum models/ and swap in a new version now (blocks until it is ready)."""
+    version = registry.reload()
+    return jsonify({**registry.status(), "success": version is not None})
+
 # -----------------------------
 # Run App
 # -----------------------------
@@ -0,0 +1,281 @@
+# bls.py
+
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# numba is imported on first search (see _native_kernels); until then, and
+# when it is not installed, prange is plain range.
+prange = range
+
+# Trial transit durations (same time unit as the light curve, days by default)
+DEFAULT_DURATIONS = (0.04, 0.06, 0.08, 0.12, 0.16, 0.25)
+# Phase bins per shortest duration; the phase-fold resolution
+BINS_PER_DURATION = 3
+# The light curve is first averaged into time bins this much finer than a
+# phase bin, so folding costs O(time bins) per period instead of O(points)
+TIME_BINS_PER_PHASE_BIN = 2
+MAX_BINS = 20000
+# Periods per work item when the search is split across threads
+PERIOD_CHUNK = 256
+
+
+# -----------------------------
+# Period Grid
+# -----------------------------
+def check_durations(durations):
+    """Trial transit durations as a float array; raises ValueError unless non-empty and all positive."""
+    durations = np.asarray(durations, dtype=np.float64).ravel()
+    if durations.size == 0 or not np.all(np.isfinite(durations) & (durations > 0)):
+        raise ValueError("durations must be a non-empty list of positive durations (days)")
+    return durations
+
+
+def period_grid(t, durations, minimum_period=None, maximum_period=None, oversample=2, max_periods=None):
+    """
+    Trial periods uniform in frequency. The step keeps the phase drift of
+    the shortest transit over the baseline below 1/oversample of its width.
+    With max_periods, a larger grid raises ValueError before it is allocated.
+    """
+    durations = check_durations(durations)
+    baseline = float(np.max(t) - np.min(t))
+    d_min = float(np.min(durations))
+    minimum_period = minimum_period or max(2.0 * float(np.max(durations)), 0.2)
+    maximum_period = maximum_period or baseline / 2.0
+    if not 0 < minimum_period < maximum_period:
+        raise ValueError(f"Empty period range [{minimum_period}, {maximum_period}]")
+    df = d_min / (oversample * baseline ** 2)
+    n_periods = int(np.ceil((1.0 / minimum_period - 1.0 / maximum_period) / df))
+    if max_periods is not None and n_periods > max_periods:
+        raise ValueError(f"{n_periods} trial periods exceed the limit of {max_periods}; "
+                         "narrow min_period/max_period or use longer durations")
+    freqs = np.arange(1.0 / maximum_period, 1.0 / minimum_period, df)
+    return np.sort(1.0 / freqs)
+
+
+# -----------------------------
+# Binned BLS Kernel
+# -----------------------------
+def _bls_periods(t, wy, w, periods, durations, bin_width, out_power, out_start, out_k, out_nb, out_s, out_r):
+    """
+    For each period: fold into nb phase bins, then slide every duration's
+    box over the (wrapped) bins with running sums. y is weighted-mean-zero
+    and sum(w) == 1, so a box with weight r and sum s has depth
+    -s / (r (1 - r)) and power s^2 / (r (1 - r)).
+    """
+    n = t.shape[0]
+    for p in prange(periods.shape[0]):
+        period = periods[p]
+        nb = min(max(int(np.ceil(period / bin_width)), 8), MAX_BINS)
+        kmax = 1
+        for d in durations:
+            kmax = max(kmax, int(round(d / period * nb)))
+        kmax = min(kmax, nb - 1)
+        sw = np.zeros(nb + kmax)
+        swy = np.zeros(nb + kmax)
+        for i in range(n):
+            b = int((t[i] % period) / period * nb)
+            if b >= nb:
+                b = nb - 1
+            sw[b] += w[i]
+            swy[b] += wy[i]
+        for b in range(kmax):
+            sw[nb + b] = sw[b]
+            swy[nb + b] = swy[b]
+
+        best, best_start, best_k, best_s, best_r = 0.0, 0, 1, 0.0, 0.0
+        for d in durations:
+            k = min(max(int(round(d / period * nb)), 1), kmax)
+            r = 0.0
+            s = 0.0
+            for b in range(k):
+                r += sw[b]
+                s += swy[b]
+            for start in range(nb):
+                if s < 0.0 and 0.0 < r < 1.0:
+                    power = s * s / (r * (1.0 - r))
+                    if power > best:
+                        best, best_start, best_k, best_s, best_r = power, start, k, s, r
+                r += sw[start + k] - sw[start]
+                s += swy[start + k] - swy[start]
+        out_power[p] = best
+        out_start[p] = best_start
+        out_k[p] = best_k
+        out_nb[p] = nb
+        out_s[p] = best_s
+        out_r[p] = best_r
+
+
+def _bls_periods_numpy(t, wy, w, periods, durations, bin_width, out_power, out_start, out_k, out_nb, out_s, out_r):
+    """NumPy version of _bls_periods (bincount fold, cumulative-sum boxes) for when numba is missing."""
+    for p, period in enumerate(periods):
+        nb = min(max(int(np.ceil(period / bin_width)), 8), MAX_BINS)
+        ks = np.clip(np.rint(np.asarray(durations) / period * nb).astype(np.int64), 1, nb - 1)
+        kmax = int(ks.max())
+        b = np.minimum((np.mod(t, period) / period * nb).astype(np.int64), nb - 1)
+        sw = np.bincount(b, w, nb)
+        swy = np.bincount(b, wy, nb)
+        cw = np.concatenate([[0.0], np.cumsum(np.concatenate([sw, sw[:kmax]]))])
+        cs = np.concatenate([[0.0], np.cumsum(np.concatenate([swy, swy[:kmax]]))])
+        starts = np.arange(nb)
+        r = cw[starts[None, :] + ks[:, None]] - cw[starts][None, :]
+        s = cs[starts[None, :] + ks[:, None]] - cs[starts][None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            power = np.where((s < 0) & (r > 0) & (r < 1), s * s / (r * (1.0 - r)), 0.0)
+        j, start = np.unravel_index(int(np.argmax(power)), power.shape)
+        out_power[p] = power[j, start]
+        out_start[p], out_k[p], out_nb[p] = start, ks[j], nb
+        out_s[p], out_r[p] = s[j, start], r[j, start]
+
+
+_KERNELS = None
+
+
+def _native_kernels():
+    """(numba, serial kernel, parallel kernel), or None when numba is not installed."""
+    global _KERNELS, prange
+    if _KERNELS is None:
+        try:
+            import numba
+        except ImportError:
+            _KERNELS = False
+        else:
+            prange = numba.prange
+            _KERNELS = (
+                numba,
+                numba.njit(cache=True, nogil=True)(_bls_periods),
+                numba.njit(cache=True, nogil=True, parallel=True)(_bls_periods),
+            )
+    return _KERNELS or None
+
+
+# -----------------------------
+# Search
+# -----------------------------
+def bls_search(time_, flux, flux_err=None, periods=None, durations=DEFAULT_DURATIONS,
+               minimum_period=None, maximum_period=None, n_jobs=1, return_periodogram=False):
+    """
+    Box Least Squares period search on a light curve (relative flux).
+    Returns the best period, mid-transit epoch, duration and depth, plus the
+    depth SNR and the power. Periods are searched in parallel: numba prange
+    threads when numba is installed, otherwise a thread pool over chunks.
+    """
+    t = np.asarray(time_, dtype=np.float64)
+    y = np.asarray(flux, dtype=np.float64)
+    keep = np.isfinite(t) & np.isfinite(y)
+    if flux_err is not None:
+        dy = np.asarray(flux_err, dtype=np.float64)
+        keep &= np.isfinite(dy) & (dy > 0)
+    t, y = t[keep], y[keep]
+    if t.size < 10:
+        raise ValueError("Need at least 10 finite (time, flux) points")
+    if flux_err is not None:
+        ivar = 1.0 / dy[keep] ** 2
+    else:
+        ivar = np.full(t.size, 1.0 / max(np.var(y), 1e-30))
+
+    durations = np.sort(check_durations(durations))
+    if periods is None:
+        periods = period_grid(t, durations, minimum_period, maximum_period)
+    periods = np.ascontiguousarray(periods, dtype=np.float64)
+
+    t0 = t.min()
+    t = t - t0
+    w = ivar / ivar.sum()
+    y = y - np.dot(w, y)
+    bin_width = durations[0] / BINS_PER_DURATION
+
+    # pre-bin in time: per-bin weight and weighted flux sums at the bin centers
+    time_bin = bin_width / TIME_BINS_PER_PHASE_BIN
+    idx = (t / time_bin).astype(np.int64)
+    sw_t = np.bincount(idx, w)
+    swy_t = np.bincount(idx, w * y)
+    filled = sw_t > 0
+    tb = (np.flatnonzero(filled) + 0.5) * time_bin
+    w_b, wy_b = sw_t[filled], swy_t[filled]
+
+    n = periods.size
+    power, start, k, nb = np.zeros(n), np.zeros(n, np.int64), np.zeros(n, np.int64), np.zeros(n, np.int64)
+    s, r = np.zeros(n), np.zeros(n)
+    kernels = _native_kernels()
+    if kernels is not None:
+        numba, serial, parallel = kernels
+        if n_jobs > 1:
+            numba.set_num_threads(min(n_jobs, numba.config.NUMBA_NUM_THREADS))
+            parallel(tb, wy_b, w_b, periods, durations, bin_width, power, start, k, nb, s, r)
+        else:
+            serial(tb, wy_b, w_b, periods, durations, bin_width, power, start, k, nb, s, r)
+    else:
+        chunks = [slice(i, i + PERIOD_CHUNK) for i in range(0, n, PERIOD_CHUNK)]
+        run = lambda c: _bls_periods_numpy(tb, wy_b, w_b, periods[c], durations, bin_width,
+                                           power[c], start[c], k[c], nb[c], s[c], r[c])
+        with ThreadPoolExecutor(max_workers=max(1, n_jobs)) as pool:
+            list(pool.map(run, chunks))
+
+    best = int(np.argmax(power))
+    period = float(periods[best])
+    bin_phase = period / nb[best]
+    duration = float(k[best] * bin_phase)
+    rb, sb = float(r[best]), float(s[best])
+    depth = -sb / (rb * (1.0 - rb)) if 0 < rb < 1 else 0.0
+    epoch = t0 + (start[best] + k[best] / 2.0) * bin_phase
+    epoch = t0 + (epoch - t0) % period
+    result = {
+        "period": period,
+        "epoch": float(epoch),
+        "duration": duration,
+        "depth": float(depth),
+        "depth_snr": float(depth * np.sqrt(ivar.sum() * rb * (1.0 - rb))),
+        "power": float(power[best]),
+        "n_periods": int(n),
+    }
+    if return_periodogram:
+        result["periodogram"] = {"period": periods, "power": power}
+    return result
+
+
+def classifier_inputs(result):
+    """BLS result as the classifier's orbital_period (days) / transit_depth (ppm) inputs."""
+    return {"orbital_period": result["period"], "transit_depth": result["depth"] * 1e6}
+
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+def synthetic_light_curve(n=100_000, baseline=27.0, period=3.7, duration=0.12, depth=0.004, noise=0.002, seed=0):
+    rng = np.random.RandomState(seed)
+    t = np.sort(rng.uniform(0, baseline, n))
+    y = 1.0 + rng.normal(0, noise, n)
+    epoch = 1.3
+    in_transit = np.abs((t - epoch + 0.5 * period) % period - 0.5 * period) < duration / 2
+    y[in_transit] -= depth
+    return t, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the BLS search on synthetic light curves")
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--n-jobs", type=int, default=1)
+    args = parser.parse_args()
+
+    t, y = synthetic_light_curve(args.points)
+    periods = period_grid(t, DEFAULT_DURATIONS, 0.5, 13.0)
+    print(f"{args.points} points, {periods.size} trial periods x {len(DEFAULT_DURATIONS)} durations", flush=True)
+    bls_search(t[:1000], y[:1000], periods=periods[:10], n_jobs=args.n_jobs)  # compile outside the timing
+    for label, jobs in (("serial", 1), (f"n_jobs={args.n_jobs}", args.n_jobs)):
+        start = time.perf_counter()
+        res = bls_search(t, y, periods=periods, n_jobs=jobs)
+        print(f"{label:>10}: {time.perf_counter() - start:7.2f} s ->",
+              {k: float(f"{v:.6g}") for k, v in res.items() if k != "n_periods"}, flush=True)
+    global _KERNELS
+    kernels, _KERNELS = _KERNELS, False
+    sub = periods[::20]
+    start = time.perf_counter()
+    bls_search(t, y, periods=sub, n_jobs=1)
+    print(f"     numpy: {(time.perf_counter() - start) * 20:7.2f} s (extrapolated from {sub.size} periods)")
+    _KERNELS = kernels
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# cache.py
+
+import threading
+from collections import OrderedDict
+
+
+# -----------------------------
+# Prediction Cache
+# -----------------------------
+class PredictionCache:
+    """
+    Bounded LRU of ensemble probabilities keyed on slider inputs rounded to
+    each slider's `step`. Entries belong to one model version (the registry's
+    checksum of models/); a lookup under a different version clears the cache.
+    """
+
+    def __init__(self, sliders, maxsize=4096):
+        self.steps = {f: float(cfg["step"]) for f, cfg in sliders.items()}
+        self.maxsize = maxsize
+        self.version = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def key(self, user_input):
+        return tuple(int(round(float(user_input[f]) / step)) for f, step in self.steps.items())
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self.version is not None:
+                self.invalidations += 1
+            self.version = version
+            self._data.clear()
+
+    def get_or_compute(self, user_input, compute, version=None):
+        key = self.key(user_input)
+        with self._lock:
+            self._check_version(version)
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            if version != self.version:
+                return value
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,91 @@
+# ensemble.py
+
+import json
+import numpy as np
+
+ENSEMBLE_FILE = "ensemble.json"
+METHODS = ("mean", "weights", "stacking")
+# Probabilities are clipped here before taking logs (as sklearn's log_loss does)
+PROB_FLOOR = 1e-15
+
+
+# -----------------------------
+# Ensemble Blender
+# -----------------------------
+class EnsembleBlender:
+    """
+    Combines member probabilities into the ensemble's, in one vectorized step
+    over an (N, n_members, n_class) array.
+
+    "mean" is the equal-weight average, "weights" a learned convex
+    combination, and "stacking" a multinomial logistic meta-learner on the
+    members' log-probabilities. Fitted by training/ensemble_training.py and
+    stored as plain JSON (models/ensemble.json).
+    """
+
+    def __init__(self, members, method="mean", weights=None, coef=None, intercept=None, report=None):
+        if method not in METHODS:
+            raise ValueError(f"Unknown blend method {method!r}; expected one of {METHODS}")
+        self.members = list(members)
+        self.method = method
+        n = len(self.members)
+        self.weights = np.full(n, 1.0 / n) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.coef = None if coef is None else np.asarray(coef, dtype=np.float64)             # (n_class, n_members * n_class)
+        self.intercept = None if intercept is None else np.asarray(intercept, dtype=np.float64)  # (n_class,)
+        self.report = report or {}
+        if method == "stacking" and (self.coef is None or self.intercept is None):
+            raise ValueError("Stacking blend needs coef and intercept")
+
+    @classmethod
+    def mean(cls, members):
+        return cls(members, "mean")
+
+    def apply(self, member_probs):
+        """(N, n_members, n_class) member probabilities -> (N, n_class) ensemble probabilities."""
+        P = np.asarray(member_probs, dtype=np.float64)
+        if self.method == "stacking":
+            Z = np.log(np.clip(P, PROB_FLOOR, 1.0)).reshape(len(P), -1) @ self.coef.T + self.intercept
+            Z -= Z.max(axis=1, keepdims=True)
+            np.exp(Z, out=Z)
+            Z /= Z.sum(axis=1, keepdims=True)
+            return Z
+        if self.method == "mean":
+            return P.mean(axis=1)
+        return np.einsum("nmk,m->nk", P, self.weights)
+
+    def restrict(self, members):
+        """
+        Blender over the available `members` (in that order), or None when a
+        member it needs is missing. Convex weights are renormalized; a
+        stacking blend is only valid with exactly the members it was fitted on.
+        """
+        if list(members) == self.members:
+            return self
+        idx = [self.members.index(m) if m in self.members else None for m in members]
+        if self.method == "stacking" or None in idx or not self.weights[idx].sum() > 0:
+            return None
+        weights = self.weights[idx] / self.weights[idx].sum()
+        return EnsembleBlender(members, "weights" if self.method == "weights" else "mean", weights, report=self.report)
+
+    # ---------- Serialization ----------
+    def to_dict(self):
+        d = {"members": self.members, "method": self.method, "weights": self.weights.tolist()}
+        if self.method == "stacking":
+            d["coef"] = self.coef.tolist()
+            d["intercept"] = self.intercept.tolist()
+        d["report"] = self.report
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["members"], d.get("method", "mean"), d.get("weights"), d.get("coef"), d.get("intercept"),
+                   d.get("report"))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,341 @@
+# features.py
+
+import json
+import numpy as np
+
+EPSILON = 1e-6
+TRANSFORM_FILE = "feature_transform.json"
+
+# -----------------------------
+# Derived Feature Formulas
+# -----------------------------
+# Same arithmetic (and operand order) as the original pandas pipeline, so
+# features computed on either path are bit-identical in float64.
+DERIVED_FEATURES = {
+    "transit_snr": lambda c: c("transit_depth") / (c("transit_duration") + EPSILON),
+    "planet_star_ratio": lambda c: c("planet_radius") / (c("stellar_radius") + EPSILON),
+    "depth_radius_ratio": lambda c: c("transit_depth") / (c("planet_radius") + EPSILON),
+    "impact_factor": lambda c: c("impact_parameter") / (c("stellar_radius") + EPSILON),
+    "scaled_teq": lambda c: c("eq_temperature") / (c("stellar_temp") + EPSILON),
+    "log_orbital_period": lambda c: np.log1p(c("orbital_period")),
+}
+
+
+def formula_operands(formula):
+    """Column names a DERIVED_FEATURES formula reads."""
+    names = []
+    formula(lambda name: names.append(name) or np.zeros(1))
+    return names
+
+
+def derive_frame(df):
+    """df plus every derived feature whose operands are columns of df (NaN operands give NaN)."""
+    out = df.copy()
+    for f, formula in DERIVED_FEATURES.items():
+        if set(formula_operands(formula)) <= set(df.columns):
+            out[f] = formula(lambda name: out[name])
+    return out
+
+
+# -----------------------------
+# Scaler Statistics
+# -----------------------------
+class ScalerStats:
+    """The parts of a fitted StandardScaler that FeaturePlan reads, without importing sklearn."""
+
+    def __init__(self, mean, scale, with_mean=True, with_std=True):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+        self.with_mean = bool(with_mean)
+        self.with_std = bool(with_std)
+
+    @classmethod
+    def from_scaler(cls, scaler):
+        return cls(scaler.mean_, scaler.scale_, scaler.with_mean, scaler.with_std)
+
+    def to_dict(self):
+        return {"mean": self.mean_.tolist(), "scale": self.scale_.tolist(),
+                "with_mean": self.with_mean, "with_std": self.with_std}
+
+
+# -----------------------------
+# Compiled Feature Plan
+# -----------------------------
+class FeaturePlan:
+    """
+    Array-based replacement for the DataFrame feature pipeline.
+
+    Built once from the feature columns, the physical feature list and the
+    fitted scaler; transform() then fills a preallocated (N, n_features)
+    array with inputs, derived features, imputed values and scaling.
+
+    With `medians` (a FeatureTransformer's), columns missing from `inputs`
+    and NaN inputs are imputed exactly as in training: raw columns take
+    their median, and derived features with a missing operand take the
+    derived feature's median. Without it, `placeholders` fill the missing
+    raw columns (artifact sets that predate feature_transform.json).
+    """
+
+    def __init__(self, feature_cols, physical_features, scaler, inputs, placeholders=None, dtype=np.float32,
+                 medians=None):
+        self.feature_cols = list(feature_cols)
+        self.inputs = list(inputs)
+        self.dtype = np.dtype(dtype)
+        self.n_features = len(self.feature_cols)
+        index = {c: i for i, c in enumerate(self.feature_cols)}
+        self._index = index
+
+        # Columns copied straight from the request, in FEATURES order
+        self._input_src = [j for j, f in enumerate(self.inputs) if f in index]
+        self._input_dst = [index[f] for f in self.inputs if f in index]
+
+        # Constant columns: medians or placeholders, and 0 for anything else training had
+        self._constants = np.zeros(self.n_features, dtype=np.float64)
+        self._constant_mask = np.ones(self.n_features, dtype=bool)
+        self._medians = None
+        if medians is not None:
+            self._medians = np.array([medians.get(c, 0.0) for c in self.feature_cols], dtype=np.float64)
+            self._constants[:] = self._medians
+        else:
+            for f, v in (placeholders or {}).items():
+                if f in index:
+                    self._constants[index[f]] = v
+        for f in self.inputs:
+            if f in index:
+                self._constant_mask[index[f]] = False
+
+        # A derived feature with an operand that is not an input is NaN in
+        # training's terms, so with medians it is a constant as well
+        self._derived = []
+        for f, formula in DERIVED_FEATURES.items():
+            if f not in index:
+                continue
+            if self._medians is not None and not set(formula_operands(formula)) <= set(self.inputs):
+                continue
+            self._derived.append((index[f], formula))
+            self._constant_mask[index[f]] = False
+
+        # Scaler columns, in the order the scaler was fitted on
+        scaled = [c for c in self.feature_cols if c not in physical_features]
+        self._scaled_idx = np.array([index[c] for c in scaled], dtype=np.intp)
+        if len(scaled):
+            self._mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else None
+            self._scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else None
+        else:
+            self._mean = self._scale = None
+
+    def allocate(self, n_rows):
+        return np.empty((n_rows, self.n_features), dtype=self.dtype)
+
+    def transform(self, X, out=None):
+        """
+        X: (N, len(inputs)) array of raw inputs in `inputs` order.
+        out: optional preallocated (N, n_features) array of any float dtype.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n = X.shape[0]
+        if out is None:
+            out = self.allocate(n)
+
+        # Work in float64 (as pandas does) and cast once into `out`
+        work = out if out.dtype == np.float64 else np.empty((n, self.n_features), dtype=np.float64)
+        work[:, self._constant_mask] = self._constants[self._constant_mask]
+        work[:, self._input_dst] = X[:, self._input_src]
+
+        col = lambda name: work[:, self._index[name]]
+        for dst, formula in self._derived:
+            work[:, dst] = formula(col)
+
+        if self._medians is not None:
+            missing = np.isnan(work)
+            if missing.any():
+                np.copyto(work, np.broadcast_to(self._medians, work.shape), where=missing)
+
+        if self._scaled_idx.size:
+            block = work[:, self._scaled_idx]
+            if self._mean is not None:
+                block -= self._mean
+            if self._scale is not None:
+                block /= self._scale
+            work[:, self._scaled_idx] = block
+
+        if work is not out:
+            out[...] = work
+        return out
+
+    def input_array(self, rows):
+        """(N, len(inputs)) float64 array from a dict, list of dicts, DataFrame or array."""
+        if isinstance(rows, np.ndarray):
+            return np.atleast_2d(rows.astype(np.float64, copy=False))
+        if isinstance(rows, dict):
+            rows = [rows]
+        if hasattr(rows, "columns"):
+            return rows[self.inputs].to_numpy(dtype=np.float64)
+        return np.array([[float(r[f]) for f in self.inputs] for r in rows], dtype=np.float64)
+
+    def transform_records(self, rows, out=None):
+        """Accepts a dict, a list of dicts or a DataFrame with the `inputs` columns."""
+        return self.transform(self.input_array(rows), out=out)
+
+
+# -----------------------------
+# Fitted Feature Transform
+# -----------------------------
+class FeatureTransformer:
+    """
+    The fitted feature pipeline shared by training and serving: the derived
+    features of DERIVED_FEATURES, imputation with the training medians and
+    the scaler on the derived (non-physical) columns.
+
+    Stored as plain JSON (models/feature_transform.json), so serving loads
+    it without sklearn. Both paths apply it through a FeaturePlan, in one
+    vectorized pass over a float64 array.
+    """
+
+    def __init__(self, feature_cols, physical_features, medians, scaler):
+        self.feature_cols = list(feature_cols)
+        self.physical_features = list(physical_features)
+        self.medians = {c: float(medians[c]) for c in self.feature_cols}
+        self.scaler = scaler
+
+    @classmethod
+    def fit(cls, df, physical_features, label_col="label", scaler=None):
+        """
+        Fit on the training split: derive, take the medians (NaN skipped),
+        impute, then fit `scaler` (a fresh StandardScaler by default) on the
+        derived columns. feature_cols is df's column order plus the derived ones.
+        """
+        X = derive_frame(df.drop(columns=[label_col], errors="ignore").astype(np.float64))
+        medians = X.median()
+        X = X.fillna(medians)
+        scaled = [c for c in X.columns if c not in physical_features]
+        if scaler is None:
+            from sklearn.preprocessing import StandardScaler
+            scaler = StandardScaler()
+        scaler.fit(X[scaled])
+        return cls(X.columns, physical_features, medians, ScalerStats.from_scaler(scaler))
+
+    @property
+    def raw_features(self):
+        return [c for c in self.feature_cols if c not in DERIVED_FEATURES]
+
+    def plan(self, inputs, dtype=np.float32):
+        return FeaturePlan(self.feature_cols, self.physical_features, self.scaler, inputs,
+                           dtype=dtype, medians=self.medians)
+
+    def transform_frame(self, df):
+        """DataFrame of feature_cols (float64, df's index) from the raw columns present in df."""
+        import pandas as pd
+        inputs = [c for c in self.raw_features if c in df.columns]
+        X = df[inputs].to_numpy(dtype=np.float64)
+        out = self.plan(inputs, dtype=np.float64).transform(X)
+        return pd.DataFrame(out, columns=self.feature_cols, index=df.index)
+
+    # ---------- Serialization ----------
+    def to_dict(self):
+        return {
+            "feature_cols": self.feature_cols,
+            "physical_features": self.physical_features,
+            "derived": [c for c in self.feature_cols if c in DERIVED_FEATURES],
+            "medians": self.medians,
+            "scaler": self.scaler.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        unknown = [c for c in d.get("derived", []) if c not in DERIVED_FEATURES]
+        if unknown:
+            raise ValueError(f"Feature transform uses derived features this code does not define: {unknown}")
+        return cls(d["feature_cols"], d["physical_features"], d["medians"], ScalerStats(**d["scaler"]))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def reference_features(df, transform):
+    """Step-by-step pandas version of transform_frame, for the parity check."""
+    X = df.astype(np.float64).reindex(columns=transform.raw_features)
+    X = derive_frame(X)[transform.feature_cols]
+    X = X.fillna(transform.medians)
+    scaled = [c for c in transform.feature_cols if c not in transform.physical_features]
+    stats = transform.scaler
+    if scaled:
+        block = X[scaled].to_numpy(dtype=np.float64)
+        if stats.with_mean:
+            block -= stats.mean_
+        if stats.with_std:
+            block /= stats.scale_
+        X[scaled] = block
+    return X
+
+
+# -----------------------------
+# Parity Check vs DataFrame Path
+# -----------------------------
+def bit_mismatches(got64, got32, reference):
+    """Elements of the float64 / float32 plan outputs that are not bit-identical to reference (float64)."""
+    reference = np.asarray(reference, dtype=np.float64)
+    mismatches = int(np.sum(got64.view(np.uint64) != reference.view(np.uint64)))
+    mismatches += int(np.sum(got32.view(np.uint32) != reference.astype(np.float32).view(np.uint32)))
+    return mismatches
+
+
+def transform_parity(transform, frame):
+    """bit_mismatches of transform.plan on frame (raw input columns) against reference_features."""
+    inputs = list(frame.columns)
+    X = frame.to_numpy(dtype=np.float64)
+    reference = reference_features(frame, transform).to_numpy(dtype=np.float64)
+    return bit_mismatches(transform.plan(inputs, dtype=np.float64).transform(X),
+                          transform.plan(inputs).transform(X), reference)
+
+
+def check_parity(n_random=2000, seed=0):
+    """
+    Compare FeaturePlan against the pandas path (reference_features, or
+    app.create_features for sets without a feature transform) on the slider
+    defaults, the slider corners and random slider inputs. Returns the
+    mismatch count.
+    """
+    import itertools
+    import pandas as pd
+    import app
+
+    rng = np.random.RandomState(seed)
+    lo = np.array([app.sliders[f]["min"] for f in app.FEATURES])
+    hi = np.array([app.sliders[f]["max"] for f in app.FEATURES])
+    default = np.array([app.sliders[f]["default"] for f in app.FEATURES])
+    corners = np.array(list(itertools.product(*zip(lo, hi))))
+    X = np.vstack([default, corners, lo + rng.rand(n_random, len(lo)) * (hi - lo)])
+
+    transform = app.registry.current.transform
+    if transform is not None:
+        # missing inputs are imputed with the training medians
+        holes = X[:200].copy()
+        holes[rng.rand(*holes.shape) < 0.3] = np.nan
+        X = np.vstack([X, holes])
+    frame = pd.DataFrame(X, columns=app.FEATURES)
+    if transform is not None:
+        reference = reference_features(frame, transform).to_numpy(dtype=np.float64)
+        plan64 = transform.plan(app.FEATURES, dtype=np.float64)
+    else:
+        reference = app.create_features(frame).to_numpy(dtype=np.float64)
+        plan64 = FeaturePlan(app.feature_cols, app.PHYSICAL_FEATURES, app.scaler,
+                             app.FEATURES, app.PLACEHOLDER_FEATURES, dtype=np.float64)
+    got64 = plan64.transform(X)
+    got32 = app.feature_plan.transform(X)
+
+    mismatches = bit_mismatches(got64, got32, reference)
+    print(f"Rows checked: {len(X)} | bit mismatches: {mismatches}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if check_parity() else 0)
@@ -0,0 +1,361 @@
+# forest.py
+
+import os
+import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# numba is imported on first prediction (see _native_kernels); until then, and
+# when it is not installed, prange is plain range.
+prange = range
+
+# Max |p_forest - p_sklearn| accepted by check_forest. LightGBM sums leaves in
+# float64 and XGBoost in float32, so the only drift is summation order.
+FOREST_ATOL = 1e-5
+
+# Missing-value handling per node (mirrors LightGBM's NumericalDecision)
+MISSING_AS_ZERO = 0     # LightGBM missing_type "None": NaN is treated as 0.0
+MISSING_NAN = 1         # NaN goes to default child (LightGBM "NaN", all XGBoost nodes)
+MISSING_ZERO = 2        # 0 or NaN goes to default child (LightGBM "Zero")
+LGB_MISSING = {"None": MISSING_AS_ZERO, "NaN": MISSING_NAN, "Zero": MISSING_ZERO}
+ZERO_THRESHOLD = 1e-35
+
+# Rows per work item in the numba kernel (and per thread when parallel)
+ROW_BLOCK = 64
+
+
+# -----------------------------
+# Booster Export
+# -----------------------------
+def _export_lightgbm(lgb_model):
+    """Flatten a fitted LGBMClassifier into per-tree node lists."""
+    dump = lgb_model.booster_.dump_model()
+    if not str(dump["objective"]).startswith("multiclass"):
+        raise ValueError(f"Unsupported LightGBM objective: {dump['objective']}")
+    n_class = int(dump["num_class"])
+    trees = []
+    for i, info in enumerate(dump["tree_info"]):
+        nodes = []
+
+        def walk(node):
+            idx = len(nodes)
+            nodes.append(None)
+            if "leaf_value" in node or "split_feature" not in node:
+                nodes[idx] = (-1, np.inf, idx, idx, False, MISSING_NAN, float(node.get("leaf_value", 0.0)))
+                return idx
+            if node["decision_type"] != "<=":
+                raise ValueError("Categorical LightGBM splits are not supported")
+            left = walk(node["left_child"])
+            right = walk(node["right_child"])
+            nodes[idx] = (int(node["split_feature"]), float(node["threshold"]), left, right,
+                          bool(node["default_left"]), LGB_MISSING[node["missing_type"]], 0.0)
+            return idx
+
+        walk(info["tree_structure"])
+        trees.append((i % n_class, nodes))
+    return n_class, np.zeros(n_class), trees
+
+
+def _export_xgboost(xgb_model):
+    """Flatten a fitted XGBClassifier into per-tree node lists."""
+    booster = xgb_model.get_booster()
+    model = json.loads(booster.save_raw("json"))
+    learner = model["learner"]
+    objective = learner["objective"]["name"]
+    if objective not in ("multi:softprob", "multi:softmax"):
+        raise ValueError(f"Unsupported XGBoost objective: {objective}")
+    n_class = int(learner["learner_model_param"]["num_class"])
+
+    # base_score is a scalar in older releases and a per-class vector in 3.x
+    base = np.atleast_1d(np.asarray(
+        json.loads(learner["learner_model_param"]["base_score"].replace("E", "e")), dtype=np.float32))
+    base = np.broadcast_to(base, (n_class,)).astype(np.float64)
+
+    gbtree = learner["gradient_booster"]["model"]
+    n_trees = len(gbtree["trees"])
+    best = booster.attr("best_iteration")
+    if best is not None:
+        indptr = gbtree.get("iteration_indptr")
+        n_trees = indptr[int(best) + 1] if indptr else (int(best) + 1) * n_class
+
+    trees = []
+    for tree, cls in zip(gbtree["trees"][:n_trees], gbtree["tree_info"][:n_trees]):
+        if any(tree.get("split_type", [])):
+            raise ValueError("Categorical XGBoost splits are not supported")
+        nodes = []
+        for k, (left, right) in enumerate(zip(tree["left_children"], tree["right_children"])):
+            cond = np.float32(tree["split_conditions"][k])
+            if left == -1:
+                nodes.append((-1, np.inf, k, k, False, MISSING_NAN, float(cond)))
+            else:
+                # XGBoost goes left when float32(x) < cond; on the float32 grid that
+                # is x32 <= nextafter(cond, -inf), which fits the shared "<=" test.
+                thr = float(np.nextafter(cond, np.float32(-np.inf)))
+                nodes.append((int(tree["split_indices"][k]), thr, left, right,
+                              bool(tree["default_left"][k]), MISSING_NAN, 0.0))
+        trees.append((int(cls), nodes))
+    return n_class, base, trees
+
+
+# -----------------------------
+# Native Traversal Kernel (numba)
+# -----------------------------
+def _walk_rows(Xs, roots, feature, threshold, left, right, default_left, missing, is_leaf, value, out, block):
+    # Tree-outer loop inside each row block keeps one tree's nodes hot in cache
+    n = Xs.shape[0]
+    for b in prange((n + block - 1) // block):
+        lo, hi = b * block, min(n, (b + 1) * block)
+        for t in range(roots.size):
+            for i in range(lo, hi):
+                nd = roots[t]
+                while not is_leaf[nd]:
+                    x = Xs[i, feature[nd]]
+                    m = missing[nd]
+                    if x == x and m != MISSING_ZERO:
+                        nd = left[nd] if x <= threshold[nd] else right[nd]
+                        continue
+                    if x != x and m == MISSING_AS_ZERO:
+                        x = 0.0
+                    if x != x or (m == MISSING_ZERO and abs(x) <= ZERO_THRESHOLD):
+                        nd = left[nd] if default_left[nd] else right[nd]
+                    else:
+                        nd = left[nd] if x <= threshold[nd] else right[nd]
+                out[i, t] = value[nd]
+
+
+_KERNELS = None
+
+
+def _native_kernels():
+    """(numba, serial kernel, parallel kernel), or None when numba is not installed."""
+    global _KERNELS, prange
+    if _KERNELS is None:
+        try:
+            import numba
+        except ImportError:  # pure NumPy traversal is used instead
+            _KERNELS = False
+        else:
+            prange = numba.prange
+            _KERNELS = (
+                numba,
+                numba.njit(cache=True, nogil=True)(_walk_rows),
+                numba.njit(cache=True, nogil=True, parallel=True)(_walk_rows),
+            )
+    return _KERNELS or None
+
+
+# -----------------------------
+# Flattened Forest
+# -----------------------------
+class FlatForest:
+    """
+    LightGBM + XGBoost ensemble compiled into one array-of-nodes forest.
+
+    All trees of all members share flat node arrays. Traversal runs in a
+    numba kernel when numba is installed, otherwise as a vectorized NumPy
+    walk over (row, tree) slots; leaf values are then summed per
+    (member, class) with one matmul, softmaxed and averaged.
+    """
+
+    def __init__(self, n_features, members, dtype_per_member):
+        feature, threshold, left, right, default_left, missing, value = [], [], [], [], [], [], []
+        roots, tree_col = [], []
+        self.n_class = members[0][0]
+        self.n_members = len(members)
+        self.n_features = n_features
+        self.base = np.zeros((self.n_members, self.n_class))
+        self.member_float32 = np.array(dtype_per_member) == "float32"
+
+        for m, (n_class, base, trees) in enumerate(members):
+            if n_class != self.n_class:
+                raise ValueError("Ensemble members disagree on num_class")
+            self.base[m] = base
+            # float32 members read from the second half of the stacked input
+            offset = n_features if self.member_float32[m] else 0
+            for cls, nodes in trees:
+                start = len(feature)
+                roots.append(start)
+                tree_col.append(m * self.n_class + cls)
+                for f, thr, l, r, dl, miss, val in nodes:
+                    feature.append(0 if f < 0 else f + offset)
+                    threshold.append(thr)
+                    left.append(start + l)
+                    right.append(start + r)
+                    default_left.append(dl)
+                    missing.append(miss)
+                    value.append(val)
+
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.missing = np.asarray(missing, dtype=np.int8)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.n_trees = len(roots)
+        self.is_leaf = (self.left == np.arange(self.left.size))
+        self.has_zero_rule = bool(np.any(self.missing == MISSING_ZERO))
+
+        # (n_trees, n_members * n_class) one-hot: leaf values -> raw scores
+        self.tree_matrix = np.zeros((self.n_trees, self.n_members * self.n_class))
+        self.tree_matrix[np.arange(self.n_trees), tree_col] = 1.0
+        self.max_depth = self._depth()
+
+    @classmethod
+    def from_models(cls, lgb_model=None, xgb_model=None):
+        members, dtypes = [], []
+        n_features = None
+        if lgb_model is not None:
+            members.append(_export_lightgbm(lgb_model))
+            dtypes.append("float64")
+            n_features = lgb_model.n_features_in_
+        if xgb_model is not None:
+            members.append(_export_xgboost(xgb_model))
+            dtypes.append("float32")
+            n_features = xgb_model.n_features_in_
+        if not members:
+            raise ValueError("At least one ensemble member is required")
+        return cls(int(n_features), members, dtypes)
+
+    # -----------------------------
+    # Persistence (one .npy per array, memory-mappable)
+    # -----------------------------
+    _ARRAYS = ("feature", "threshold", "left", "right", "default_left", "missing",
+               "value", "roots", "is_leaf", "tree_matrix", "base", "member_float32")
+    _SCALARS = ("n_class", "n_members", "n_features", "n_trees", "has_zero_rule", "max_depth")
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in self._ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "forest.json"), "w") as f:
+            json.dump({name: getattr(self, name) for name in self._SCALARS}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Read-only arrays mapped from disk, so forked workers share one copy via the page cache."""
+        forest = cls.__new__(cls)
+        for name in cls._ARRAYS:
+            setattr(forest, name, np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)))
+        with open(os.path.join(path, "forest.json")) as f:
+            for name, value in json.load(f).items():
+                setattr(forest, name, value)
+        return forest
+
+    def _depth(self):
+        depth, node = 0, self.roots
+        while node.size:
+            node = np.concatenate([self.left[node], self.right[node]])
+            node = node[~self.is_leaf[node]]
+            depth += 1
+        return depth
+
+    def _stack_inputs(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        X32 = X.astype(np.float32).astype(np.float64)
+        return np.ascontiguousarray(np.hstack([X, X32]))
+
+    def _leaf_values(self, Xs, parallel=False):
+        n, width = Xs.shape
+        kernels = _native_kernels()
+        if kernels is not None:
+            out = np.empty((n, self.n_trees), dtype=np.float64)
+            walk = kernels[2] if parallel else kernels[1]
+            walk(Xs, self.roots, self.feature, self.threshold, self.left, self.right,
+                 self.default_left, self.missing, self.is_leaf, self.value, out, ROW_BLOCK)
+            return out
+
+        flat = Xs.ravel()
+        # One slot per (row, tree); only slots still on a split node are advanced
+        node = np.tile(self.roots, n)
+        row_offset = np.repeat(np.arange(n, dtype=np.intp) * width, self.n_trees)
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            nd = node[active]
+            x = flat[row_offset[active] + self.feature[nd]]
+            if self.has_zero_rule or np.isnan(x).any():
+                miss = self.missing[nd]
+                isnan = np.isnan(x)
+                x = np.where(isnan & (miss != MISSING_NAN), 0.0, x)
+                use_default = ((miss == MISSING_ZERO) & (np.abs(x) <= ZERO_THRESHOLD)) | ((miss == MISSING_NAN) & isnan)
+                go_left = np.where(use_default, self.default_left[nd], x <= self.threshold[nd])
+            else:
+                go_left = x <= self.threshold[nd]
+            nd = np.where(go_left, self.left[nd], self.right[nd])
+            node[active] = nd
+            active = active[~self.is_leaf[nd]]
+        return self.value[node].reshape(n, self.n_trees)
+
+    def _predict_chunk(self, X, parallel=False):
+        raw = self._leaf_values(self._stack_inputs(X), parallel) @ self.tree_matrix
+        raw = raw.reshape(-1, self.n_members, self.n_class) + self.base
+        raw -= raw.max(axis=2, keepdims=True)
+        probs = np.exp(raw)
+        probs /= probs.sum(axis=2, keepdims=True)
+        return probs
+
+    def predict_member_proba(self, X, n_jobs=1, chunk_size=256):
+        """
+        (N, n_members, n_class) probabilities. With n_jobs != 1, batches larger
+        than chunk_size are split across threads (numba prange when available).
+        """
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if n_jobs == 1 or len(X) <= chunk_size:
+            return self._predict_chunk(X)
+        kernels = _native_kernels()
+        if kernels is not None:
+            numba = kernels[0]
+            if n_jobs > 0:
+                numba.set_num_threads(min(n_jobs, numba.config.NUMBA_NUM_THREADS))
+            return self._predict_chunk(X, parallel=True)
+        chunks = [X[i:i + chunk_size] for i in range(0, len(X), chunk_size)]
+        with ThreadPoolExecutor(max_workers=None if n_jobs < 0 else n_jobs) as pool:
+            return np.concatenate(list(pool.map(self._predict_chunk, chunks)))
+
+    def predict_proba(self, X, n_jobs=1, chunk_size=256):
+        """Equal-weight ensemble average, as in (lgb_probs + xgb_probs) / 2."""
+        return self.predict_member_proba(X, n_jobs=n_jobs, chunk_size=chunk_size).mean(axis=1)
+
+
+# -----------------------------
+# Parity Check vs sklearn Wrappers
+# -----------------------------
+def check_forest(forest, models, X, atol=FOREST_ATOL):
+    """Max abs difference to each wrapper's predict_proba; raises if above atol."""
+    got = forest.predict_member_proba(X)
+    worst = 0.0
+    for m, model in enumerate(models):
+        worst = max(worst, float(np.max(np.abs(got[:, m, :] - model.predict_proba(X)))))
+    if worst > atol:
+        raise AssertionError(f"Forest probabilities differ by {worst:.3g} (> {atol:g})")
+    return worst
+
+
+if __name__ == "__main__":
+    import time
+    import app
+
+    rng = np.random.RandomState(0)
+    lo = np.array([app.sliders[f]["min"] for f in app.FEATURES])
+    hi = np.array([app.sliders[f]["max"] for f in app.FEATURES])
+    X = app.feature_plan.transform(lo + rng.rand(5000, len(lo)) * (hi - lo))
+    forest = FlatForest.from_models(app.lgb_model, app.xgb_model)
+    print(f"Trees: {forest.n_trees} | nodes: {forest.feature.size} | depth: {forest.max_depth}")
+    print(f"Max |diff| vs sklearn wrappers: {check_forest(forest, [app.lgb_model, app.xgb_model], X):.3g}")
+
+    forest.predict_proba(X[:2]), forest.predict_proba(X, n_jobs=-1)  # JIT warm-up
+    for n in (1, 16, 1000):
+        Xn = X[:n]
+        t0 = time.perf_counter()
+        for _ in range(20):
+            (app.lgb_model.predict_proba(Xn) + app.xgb_model.predict_proba(Xn)) / 2
+        t1 = time.perf_counter()
+        for _ in range(20):
+            forest.predict_proba(Xn, n_jobs=-1)
+        t2 = time.perf_counter()
+        print(f"N={n:5d} | wrappers {(t1 - t0) / 20 * 1e3:8.3f} ms | forest {(t2 - t1) / 20 * 1e3:8.3f} ms")
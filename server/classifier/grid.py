@@ -0,0 +1,177 @@
+# grid.py
+
+import os
+import argparse
+import itertools
+import numpy as np
+
+GRID_FILE = "probability_grid.npy"
+AXES_FILE = "probability_grid_axes.npz"
+
+# Slider dimensions spanning orders of magnitude are gridded in log space
+LOG_FEATURES = {"orbital_period", "transit_depth", "planet_radius"}
+DEFAULT_POINTS = 24
+
+
+# -----------------------------
+# Grid Axes
+# -----------------------------
+def build_axes(sliders, features, points=DEFAULT_POINTS):
+    """One axis per feature over the slider [min, max]; `points` is an int or a per-feature dict."""
+    axes, log_flags = [], []
+    for f in features:
+        n = points.get(f, DEFAULT_POINTS) if isinstance(points, dict) else int(points)
+        lo, hi = float(sliders[f]["min"]), float(sliders[f]["max"])
+        is_log = f in LOG_FEATURES and lo > 0
+        axes.append(np.geomspace(lo, hi, n) if is_log else np.linspace(lo, hi, n))
+        log_flags.append(is_log)
+    return axes, np.array(log_flags)
+
+
+# -----------------------------
+# Interpolated Lookup
+# -----------------------------
+class ProbabilityGrid:
+    """
+    Ensemble probabilities precomputed on a 4-D slider grid, answered by
+    multilinear interpolation (in log space for LOG_FEATURES axes).
+    """
+
+    def __init__(self, probs, axes, log_flags, features, error=None, version=None):
+        self.probs = probs
+        self.version = version  # model version the grid was evaluated with
+        self.features = list(features)
+        self.log_flags = np.asarray(log_flags, dtype=bool)
+        self.axes = [np.log(a) if lg else np.asarray(a, dtype=np.float64)
+                     for a, lg in zip(axes, self.log_flags)]
+        self.n_class = probs.shape[-1]
+        self.error = error or {}
+        # plain ndarray view over the (possibly memory-mapped) buffer
+        self._flat = np.asarray(probs).reshape(-1, self.n_class)
+        strides = np.array([int(np.prod(probs.shape[d + 1:-1])) for d in range(len(self.axes))], dtype=np.intp)
+        self._strides = strides
+        # the 2^d hypercube corners as 0/1 bits and their flat offsets
+        self._corners = np.array(list(itertools.product((0, 1), repeat=len(self.axes))), dtype=bool)
+        self._corner_offsets = self._corners.astype(np.intp) @ strides
+
+    @classmethod
+    def load(cls, model_dir, mmap_mode="r"):
+        probs = np.load(os.path.join(model_dir, GRID_FILE), mmap_mode=mmap_mode)
+        meta = np.load(os.path.join(model_dir, AXES_FILE), allow_pickle=False)
+        features = [str(f) for f in meta["features"]]
+        axes = [meta[f"axis_{d}"] for d in range(len(features))]
+        error = {k[len("error_"):]: float(meta[k]) for k in meta.files if k.startswith("error_")}
+        version = str(meta["model_version"]) if "model_version" in meta.files else None
+        return cls(probs, axes, meta["log_flags"], features, error, version)
+
+    def save(self, model_dir):
+        np.save(os.path.join(model_dir, GRID_FILE), np.ascontiguousarray(self.probs, dtype=np.float32))
+        raw_axes = {f"axis_{d}": (np.exp(a) if lg else a) for d, (a, lg) in enumerate(zip(self.axes, self.log_flags))}
+        errors = {f"error_{k}": v for k, v in self.error.items()}
+        np.savez(os.path.join(model_dir, AXES_FILE), features=np.array(self.features),
+                 log_flags=self.log_flags, model_version=np.array(self.version or ""), **raw_axes, **errors)
+
+    def _grid_coords(self, X):
+        """X in axis units (log for log_flags axes)."""
+        G = np.array(X, dtype=np.float64)
+        G[:, self.log_flags] = np.log(np.maximum(G[:, self.log_flags], 1e-300))
+        return G
+
+    def in_range(self, X):
+        """(N,) mask of the rows inside [axis[0], axis[-1]] on every axis (the grid is not extrapolated)."""
+        G = self._grid_coords(np.atleast_2d(np.asarray(X, dtype=np.float64)))
+        lo = np.array([a[0] for a in self.axes])
+        hi = np.array([a[-1] for a in self.axes])
+        return np.all((G >= lo) & (G <= hi), axis=1)
+
+    def predict_proba(self, X, fallback=None):
+        """
+        X: (N, n_features) raw slider inputs in `features` order. Rows outside
+        the grid are scored by fallback (raw rows -> probabilities), usually
+        the models; without one, they are a ValueError.
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        inside = self.in_range(X)
+        if not inside.all():
+            if fallback is None:
+                raise ValueError(f"{int((~inside).sum())} row(s) outside the probability grid")
+            out = np.empty((X.shape[0], self.n_class), dtype=np.float64)
+            out[~inside] = fallback(X[~inside])
+            if inside.any():
+                out[inside] = self._interpolate(X[inside])
+            return out
+        return self._interpolate(X)
+
+    def _interpolate(self, X):
+        G = self._grid_coords(X)
+        base = np.zeros(X.shape[0], dtype=np.intp)
+        frac = np.empty(X.shape, dtype=np.float64)
+        for d, axis in enumerate(self.axes):
+            x = G[:, d]
+            i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, axis.size - 2)
+            frac[:, d] = (x - axis[i]) / (axis[i + 1] - axis[i])
+            base += i * self._strides[d]
+
+        # (2^d, N) corner weights: product of frac or (1 - frac) per dimension
+        weights = np.where(self._corners[:, None, :], frac[None, :, :], 1.0 - frac[None, :, :]).prod(axis=2)
+        values = self._flat[base[None, :] + self._corner_offsets[:, None]]
+        return np.einsum("cn,cnk->nk", weights, values)
+
+
+# -----------------------------
+# Offline Build
+# -----------------------------
+def build_grid(predict_fn, sliders, features, points=DEFAULT_POINTS, batch_size=65536):
+    """Evaluate predict_fn (raw (N, 4) inputs -> (N, n_class) probs) on every grid node."""
+    axes, log_flags = build_axes(sliders, features, points)
+    shape = tuple(a.size for a in axes)
+    mesh = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+    chunks = [predict_fn(mesh[i:i + batch_size]) for i in range(0, len(mesh), batch_size)]
+    probs = np.concatenate(chunks).astype(np.float32).reshape(shape + (-1,))
+    return ProbabilityGrid(probs, axes, log_flags, features)
+
+
+def measure_error(grid, predict_fn, sliders, n_samples=20000, seed=0):
+    """Max / p99 / mean abs probability error against the real models on random slider inputs."""
+    rng = np.random.RandomState(seed)
+    cols = []
+    for f, lg in zip(grid.features, grid.log_flags):
+        lo, hi = float(sliders[f]["min"]), float(sliders[f]["max"])
+        u = rng.rand(n_samples)
+        cols.append(np.exp(np.log(lo) + u * (np.log(hi) - np.log(lo))) if lg else lo + u * (hi - lo))
+    X = np.column_stack(cols)
+    truth = predict_fn(X)
+    approx = grid.predict_proba(X, fallback=predict_fn)
+    err = np.abs(approx - truth)
+    return {
+        "max": float(err.max()),
+        "p99": float(np.percentile(err.max(axis=1), 99)),
+        "mean": float(err.mean()),
+        "class_agreement": float(np.mean(truth.argmax(1) == approx.argmax(1))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the ensemble probability grid for the slider UI")
+    parser.add_argument("--points", type=int, default=DEFAULT_POINTS, help="grid nodes per slider axis")
+    parser.add_argument("--samples", type=int, default=20000, help="random inputs used to measure the error bound")
+    args = parser.parse_args()
+
+    import app
+
+    models = app.registry.current
+
+    def predict_fn(X):
+        return app.predict_ensemble(X, use_grid=False, models=models)
+
+    print(f"Building {args.points}^{len(app.FEATURES)} probability grid...")
+    grid = build_grid(predict_fn, app.sliders, app.FEATURES, args.points)
+    grid.error = measure_error(grid, predict_fn, app.sliders, args.samples)
+    grid.version = models.version
+    grid.save(app.MODEL_DIR)
+    print(f"✅ Grid saved to {os.path.join(app.MODEL_DIR, GRID_FILE)} with shape {grid.probs.shape}")
+    print("Error vs models:", {k: round(v, 5) for k, v in grid.error.items()})
+
+
+if __name__ == "__main__":
+    main()
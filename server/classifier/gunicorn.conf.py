@@ -0,0 +1,16 @@
+# gunicorn.conf.py  —  gunicorn -c gunicorn.conf.py app:app
+
+import os
+
+bind = os.environ.get("EXO_BIND", "0.0.0.0:5003")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+
+# Import the app and load the compiled models in the master, so forked workers
+# share the memory-mapped forest pages instead of each loading a copy.
+preload_app = os.environ.get("EXO_PRELOAD_MODELS", "1") == "1"
+
+
+def when_ready(server):
+    if preload_app:
+        import app
+        app.preload_models()
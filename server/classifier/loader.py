@@ -0,0 +1,262 @@
+# loader.py
+
+import io
+import os
+import json
+import shutil
+import hashlib
+import threading
+import numpy as np
+
+from ensemble import EnsembleBlender, ENSEMBLE_FILE
+from features import FeaturePlan, FeatureTransformer, ScalerStats, TRANSFORM_FILE
+from forest import FlatForest, check_forest
+
+SOURCE_ARTIFACTS = ("lightgbm_model.pkl", "xgboost_model.pkl", "scaler.pkl", "feature_cols.pkl", TRANSFORM_FILE,
+                    ENSEMBLE_FILE)
+# The fitted feature transform, or (older artifact sets) the scaler and column pickles
+REQUIRED_ARTIFACTS = ("scaler.pkl", "feature_cols.pkl")
+MEMBER_ARTIFACTS = {"lightgbm": "lightgbm_model.pkl", "xgboost": "xgboost_model.pkl"}
+COMPILED_DIR = "compiled"
+MANIFEST_FILE = "manifest.json"
+
+# Inputs the compiled forest is verified on: slider minimums, defaults and maximums
+FOREST_PROBE = [[0.5, 100, 0.5, 0.5], [15, 3269, 6, 1.05], [50, 10000, 20, 2]]
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def artifact_checksums(model_dir):
+    """{name: sha256} for each pickled artifact present in model_dir."""
+    return {
+        name: file_sha256(os.path.join(model_dir, name))
+        for name in SOURCE_ARTIFACTS
+        if os.path.exists(os.path.join(model_dir, name))
+    }
+
+
+def version_id(checksums):
+    """Short content hash identifying one artifact set."""
+    h = hashlib.sha256()
+    for name in sorted(checksums):
+        h.update(f"{name}:{checksums[name]}\n".encode())
+    return h.hexdigest()[:12]
+
+
+# -----------------------------
+# Lazy Model Loader
+# -----------------------------
+class LazyModels:
+    """
+    One version of the classifier artifacts, loaded on first use.
+
+    Serving only needs the feature columns, the scaler statistics and the flat
+    forest. These are compiled once from the pickles into
+    models/compiled/<version>/ as plain .npy files. Later starts memory-map
+    them, so lightgbm, xgboost and sklearn are imported only when a wrapper
+    model is actually requested. Ensemble members whose pickle is missing
+    are left out instead of failing the whole load.
+
+    Members are combined by the fitted blend in models/ensemble.json when
+    present (members it dropped are neither loaded nor compiled), otherwise
+    by the equal-weight average.
+
+    The source bytes of the version are read (and checked against its
+    checksums) when it is created, so wrappers unpickled later still come
+    from this version even after newer artifacts replaced the files.
+    """
+
+    def __init__(self, model_dir, inputs, physical_features, placeholders, use_forest=True, checksums=None):
+        self.model_dir = model_dir
+        self.inputs = inputs
+        self.physical_features = physical_features
+        self.placeholders = placeholders
+        self.use_forest = use_forest
+        self.checksums = checksums if checksums is not None else artifact_checksums(model_dir)
+        missing = [name for name in REQUIRED_ARTIFACTS if name not in self.checksums]
+        if missing and TRANSFORM_FILE not in self.checksums:
+            raise FileNotFoundError(f"Missing model artifacts in {model_dir}: {missing}")
+        self.version = version_id(self.checksums)
+        self._sources = {name: self._read_source(name) for name in self.checksums}
+        self.members = [m for m, name in MEMBER_ARTIFACTS.items() if name in self.checksums]
+        if not self.members:
+            raise FileNotFoundError(f"No ensemble member found in {model_dir}")
+        self.blender = EnsembleBlender.mean(self.members)
+        if ENSEMBLE_FILE in self.checksums:
+            fitted = EnsembleBlender.from_dict(json.loads(self._read(ENSEMBLE_FILE)))
+            members = [m for m in self.members if m in fitted.members]
+            blender = fitted.restrict(members) if members else None
+            if blender is None:
+                print(f"[ensemble] {ENSEMBLE_FILE} needs {fitted.members}, have {self.members}; "
+                      "using the equal-weight average")
+            else:
+                self.members, self.blender = members, blender
+        for m, name in MEMBER_ARTIFACTS.items():
+            if m not in self.members:
+                self._sources.pop(name, None)
+        self.compiled_dir = os.path.join(model_dir, COMPILED_DIR, self.version)
+        self._lock = threading.RLock()
+        self._loaded = {}
+
+    def _get(self, name, load):
+        try:
+            return self._loaded[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._loaded:
+                self._loaded[name] = load()
+            return self._loaded[name]
+
+    def _read_source(self, filename):
+        with open(os.path.join(self.model_dir, filename), "rb") as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != self.checksums.get(filename):
+            raise RuntimeError(f"{filename} changed on disk since version {self.version} was checksummed")
+        return data
+
+    def _read(self, filename):
+        """Bytes of an artifact of *this* version (kept since registration)."""
+        try:
+            return self._sources[filename]
+        except KeyError:
+            raise FileNotFoundError(f"{filename} is not part of version {self.version}") from None
+
+    def _load_pickle(self, filename):
+        """Unpickle an artifact of *this* version (imports sklearn / lightgbm / xgboost)."""
+        import joblib
+        return joblib.load(io.BytesIO(self._read(filename)))
+
+    # ---------- Wrapper models (heavy) ----------
+    @property
+    def lgb_model(self):
+        return self._get("lgb_model", lambda: self._load_pickle("lightgbm_model.pkl")
+                         if "lightgbm" in self.members else None)
+
+    @property
+    def xgb_model(self):
+        return self._get("xgb_model", lambda: self._load_pickle("xgboost_model.pkl")
+                         if "xgboost" in self.members else None)
+
+    @property
+    def scaler(self):
+        return self._get("scaler", lambda: self._load_pickle("scaler.pkl"))
+
+    def member_models(self):
+        return [m for m in (self.lgb_model, self.xgb_model) if m is not None]
+
+    # ---------- Compiled artifacts (light) ----------
+    def _manifest(self):
+        """The compiled manifest for this version, or None if it has not been built."""
+        try:
+            with open(os.path.join(self.compiled_dir, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get("version") == self.version else None
+
+    @property
+    def manifest(self):
+        return self._get("manifest", lambda: self._manifest() or self.compile())
+
+    @property
+    def feature_cols(self):
+        return self._get("feature_cols", lambda: list(self.manifest["feature_cols"]))
+
+    @property
+    def scaler_stats(self):
+        return self._get("scaler_stats", lambda: ScalerStats(**self.manifest["scaler"]))
+
+    @property
+    def transform(self):
+        """The fitted FeatureTransformer, or None for sets without feature_transform.json."""
+        def load():
+            d = self.manifest.get("transform")
+            return FeatureTransformer.from_dict(d) if d else None
+        return self._get("transform", load)
+
+    def _plan(self, feature_cols, stats, transform):
+        if transform is not None:
+            return transform.plan(self.inputs)
+        return FeaturePlan(feature_cols, self.physical_features, stats, self.inputs, self.placeholders)
+
+    @property
+    def feature_plan(self):
+        return self._get("feature_plan", lambda: self._plan(self.feature_cols, self.scaler_stats, self.transform))
+
+    @property
+    def flat_forest(self):
+        """Memory-mapped FlatForest, or None if it is disabled or failed verification."""
+        def load():
+            if not self.use_forest or not self.manifest.get("forest"):
+                return None
+            return FlatForest.load(os.path.join(self.compiled_dir, "forest"))
+        return self._get("flat_forest", load)
+
+    def compile(self):
+        """Build this version's compiled directory from the pickles (imports the heavy libraries)."""
+        with self._lock:
+            transform = None
+            if TRANSFORM_FILE in self.checksums:
+                transform = FeatureTransformer.from_dict(json.loads(self._read(TRANSFORM_FILE)))
+                feature_cols, stats = transform.feature_cols, transform.scaler
+            else:
+                feature_cols = self._load_pickle("feature_cols.pkl")
+                stats = ScalerStats.from_scaler(self.scaler)
+            manifest = {
+                "version": self.version,
+                "checksums": self.checksums,
+                "members": self.members,
+                "feature_cols": list(feature_cols),
+                "scaler": stats.to_dict(),
+                "transform": transform.to_dict() if transform is not None else None,
+                "forest": False,
+            }
+
+            tmp_dir = f"{self.compiled_dir}.tmp{os.getpid()}"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            if self.use_forest:
+                try:
+                    forest = FlatForest.from_models(self.lgb_model, self.xgb_model)
+                    plan = self._plan(feature_cols, stats, transform)
+                    manifest["forest_max_diff"] = check_forest(forest, self.member_models(), plan.transform(FOREST_PROBE))
+                    forest.save(os.path.join(tmp_dir, "forest"))
+                    manifest["forest"] = True
+                except Exception as e:
+                    print(f"[forest] disabled for {self.version}, falling back to sklearn wrappers: {e}")
+
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+                json.dump(manifest, f)
+            shutil.rmtree(self.compiled_dir, ignore_errors=True)
+            try:
+                os.replace(tmp_dir, self.compiled_dir)
+            except OSError:
+                # another worker published the same compile first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            return manifest
+
+    def predict_proba(self, X, forest_max_rows=256, n_jobs=1):
+        """Blended probabilities of the members on engineered features X."""
+        flat_forest = self.flat_forest
+        if flat_forest is not None and len(X) <= forest_max_rows:
+            member_probs = flat_forest.predict_member_proba(X, n_jobs=n_jobs)
+        else:
+            member_probs = np.stack([m.predict_proba(X) for m in self.member_models()], axis=1)
+        return self.blender.apply(member_probs)
+
+    def preload(self, wrappers=False):
+        """Load everything serving needs now (e.g. in the gunicorn master, before fork)."""
+        plan = self.feature_plan
+        if self.flat_forest is not None:
+            # also imports numba and loads the compiled traversal kernels
+            self.flat_forest.predict_proba(plan.transform(FOREST_PROBE))
+        if wrappers or self.flat_forest is None:
+            self.member_models()
+        return self
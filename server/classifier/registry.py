@@ -0,0 +1,122 @@
+# registry.py
+
+import os
+import shutil
+import threading
+import time
+
+from loader import LazyModels, SOURCE_ARTIFACTS, COMPILED_DIR, artifact_checksums, version_id
+
+KEEP_COMPILED_VERSIONS = 3
+
+
+def stat_fingerprint(model_dir):
+    """Cheap change detector: (name, mtime_ns, size) of each source artifact."""
+    entries = []
+    for name in SOURCE_ARTIFACTS:
+        try:
+            st = os.stat(os.path.join(model_dir, name))
+        except FileNotFoundError:
+            continue
+        entries.append((name, st.st_mtime_ns, st.st_size))
+    return tuple(entries)
+
+
+# -----------------------------
+# Model Registry
+# -----------------------------
+class ModelRegistry:
+    """
+    Tracks versions of the artifact set in models/ by checksum and hot-swaps
+    the serving version.
+
+    Requests read `registry.current` once and use that LazyModels snapshot
+    throughout, so a swap never mixes versions inside one prediction. When
+    the files change, the new version is checksummed, compiled and warmed in
+    a background thread; the reference is switched only once it is ready.
+    Until then, and if the new set fails to load, the old version keeps
+    serving.
+    """
+
+    def __init__(self, model_dir, factory, check_interval=2.0):
+        self.model_dir = model_dir
+        self.factory = factory   # checksums -> LazyModels
+        self.check_interval = check_interval
+        self.history = []
+        self.last_error = None
+        self._current = None
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._reload_thread = None
+
+    @property
+    def current(self):
+        if self.check_interval is not None and time.monotonic() - self._checked_at >= self.check_interval:
+            self._checked_at = time.monotonic()
+            if stat_fingerprint(self.model_dir) != self._fingerprint:
+                self.reload_async()
+        if self._current is None:
+            raise RuntimeError(f"No model version loaded: {self.last_error}")
+        return self._current
+
+    def reload(self, preload=True):
+        """Checksum the artifacts and swap in a new version if they changed. Returns the serving version."""
+        with self._lock:
+            fingerprint = stat_fingerprint(self.model_dir)
+            try:
+                checksums = artifact_checksums(self.model_dir)
+                if self._current is not None and version_id(checksums) == self._current.version:
+                    self._fingerprint = fingerprint
+                    return self._current.version
+                models = self.factory(checksums)
+                if preload:
+                    models.preload()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"[registry] keeping version {self._current and self._current.version}: {self.last_error}")
+                self._fingerprint = fingerprint
+                return self._current.version if self._current is not None else None
+
+            self._current = models
+            self._fingerprint = fingerprint
+            self.last_error = None
+            self.history.append({
+                "version": models.version,
+                "members": models.members,
+                "checksums": models.checksums,
+                "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+            print(f"[registry] serving model version {models.version} ({', '.join(models.members)})")
+            self._prune_compiled()
+            return models.version
+
+    def reload_async(self):
+        """Start a background reload unless one is already running."""
+        if self._reload_thread is not None and self._reload_thread.is_alive():
+            return
+        self._reload_thread = threading.Thread(target=self.reload, daemon=True)
+        self._reload_thread.start()
+
+    def _prune_compiled(self):
+        root = os.path.join(self.model_dir, COMPILED_DIR)
+        keep = {h["version"] for h in self.history[-KEEP_COMPILED_VERSIONS:]}
+        try:
+            names = os.listdir(root)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name not in keep and ".tmp" not in name:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def status(self):
+        current = self._current
+        return {
+            "version": current.version if current else None,
+            "members": current.members if current else [],
+            "blend": current.blender.method if current else None,
+            "checksums": current.checksums if current else {},
+            "history": self.history,
+            "last_error": self.last_error,
+            "reloading": bool(self._reload_thread and self._reload_thread.is_alive()),
+        }
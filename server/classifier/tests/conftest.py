@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the classifier modules are imported top-level, as app.py and the training scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FeatureTransformer, reference_features, transform_parity, check_parity
+
+PHYSICAL_FEATURES = [
+    "orbital_period", "transit_duration", "transit_depth",
+    "impact_parameter", "eccentricity", "planet_radius",
+    "semi_major_axis", "eq_temperature", "stellar_radius",
+    "stellar_mass", "stellar_temp", "stellar_logg", "stellar_metallicity"
+]
+SERVING_INPUTS = ["orbital_period", "transit_depth", "planet_radius", "stellar_radius"]
+EPSILON = 1e-6
+
+
+@pytest.fixture(scope="module")
+def train():
+    """A small stand-in for the training split, with missing values."""
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame(rng.lognormal(0.0, 1.0, size=(300, len(PHYSICAL_FEATURES))), columns=PHYSICAL_FEATURES)
+    df = df.mask(rng.rand(*df.shape) < 0.05)
+    df["label"] = rng.randint(0, 3, size=len(df))
+    return df
+
+
+@pytest.fixture(scope="module")
+def transform(train):
+    return FeatureTransformer.fit(train, PHYSICAL_FEATURES)
+
+
+def old_pipeline_features(df):
+    """The pre-FeatureTransformer training code: pandas derived columns, then median imputation."""
+    df = df.drop(columns=["label"], errors="ignore").astype(np.float64)
+    df["transit_snr"] = df["transit_depth"] / (df["transit_duration"] + EPSILON)
+    df["planet_star_ratio"] = df["planet_radius"] / (df["stellar_radius"] + EPSILON)
+    df["depth_radius_ratio"] = df["transit_depth"] / (df["planet_radius"] + EPSILON)
+    df["impact_factor"] = df["impact_parameter"] / (df["stellar_radius"] + EPSILON)
+    df["scaled_teq"] = df["eq_temperature"] / (df["stellar_temp"] + EPSILON)
+    df["log_orbital_period"] = np.log1p(df["orbital_period"])
+    return df.fillna(df.median())
+
+
+def test_transform_matches_the_old_training_features(train, transform):
+    expected = old_pipeline_features(train)
+    scaled = [c for c in expected.columns if c not in PHYSICAL_FEATURES]
+    expected[scaled] = (expected[scaled].to_numpy() - transform.scaler.mean_) / transform.scaler.scale_
+    got = transform.transform_frame(train)
+    assert list(got.columns) == list(expected.columns)
+    assert np.array_equal(got.to_numpy().view(np.uint64), expected.to_numpy().view(np.uint64))
+
+
+@pytest.mark.parametrize("inputs", [PHYSICAL_FEATURES, SERVING_INPUTS])
+def test_plan_matches_reference_features(train, transform, inputs):
+    frame = train[inputs].copy()
+    assert transform_parity(transform, frame) == 0
+    assert reference_features(frame, transform).notna().all().all()
+
+
+def test_transform_round_trips_through_json(train, transform):
+    loaded = FeatureTransformer.from_dict(transform.to_dict())
+    frame = train[SERVING_INPUTS]
+    assert transform_parity(loaded, frame) == 0
+    assert np.array_equal(loaded.transform_frame(frame).to_numpy(), transform.transform_frame(frame).to_numpy())
+
+
+def test_serving_plan_parity():
+    app = pytest.importorskip("app")
+    try:
+        app.registry.current
+    except Exception as e:
+        pytest.skip(f"no servable models: {e}")
+    assert check_parity(n_random=200) == 0
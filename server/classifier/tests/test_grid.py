@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from grid import build_grid
+
+FEATURES = ["orbital_period", "transit_depth", "planet_radius", "stellar_radius"]
+SLIDERS = {
+    "orbital_period": {"min": 0.5, "max": 50},
+    "transit_depth": {"min": 100, "max": 10000},
+    "planet_radius": {"min": 0.5, "max": 20},
+    "stellar_radius": {"min": 0.5, "max": 2},
+}
+
+
+def smooth_probs(X):
+    """A cheap stand-in for the ensemble: softmax of a few smooth scores."""
+    X = np.asarray(X, dtype=np.float64)
+    z = np.column_stack([np.log(X[:, 0]), np.log(X[:, 1]) / 4, X[:, 2] / (X[:, 3] * 10)])
+    z = np.exp(z - z.max(axis=1, keepdims=True))
+    return z / z.sum(axis=1, keepdims=True)
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return build_grid(smooth_probs, SLIDERS, FEATURES, points=6)
+
+
+def test_out_of_range_rows_use_the_fallback(grid):
+    X = np.array([[365.0, 3269.0, 6.0, 1.05],   # orbital_period above the grid
+                  [15.0, 3269.0, 6.0, 0.1],      # stellar_radius below it
+                  [15.0, 3269.0, 6.0, 1.05]])    # inside
+    assert grid.in_range(X).tolist() == [False, False, True]
+    probs = grid.predict_proba(X, fallback=smooth_probs)
+    np.testing.assert_allclose(probs[:2], smooth_probs(X[:2]), rtol=0, atol=0)
+    assert not np.allclose(probs[:2], grid.predict_proba(np.clip(X[:2], [0.5, 100, 0.5, 0.5], [50, 10000, 20, 2])))
+
+
+def test_out_of_range_rows_are_not_clipped_without_a_fallback(grid):
+    with pytest.raises(ValueError):
+        grid.predict_proba([[365.0, 3269.0, 6.0, 1.05]])
+
+
+def test_grid_nodes_are_exact(grid):
+    X = np.array([[0.5, 100.0, 0.5, 0.5], [50.0, 10000.0, 20.0, 2.0]])
+    np.testing.assert_allclose(grid.predict_proba(X, fallback=smooth_probs), smooth_probs(X), atol=1e-6)
+
+
+def test_app_scores_out_of_range_rows_with_the_models(monkeypatch):
+    app = pytest.importorskip("app")
+    try:
+        models = app.registry.current
+    except Exception as e:
+        pytest.skip(f"no servable models: {e}")
+
+    def predict_fn(X):
+        return app.predict_ensemble(X, models=models)
+
+    small = build_grid(predict_fn, app.sliders, app.FEATURES, points=3)
+    small.version = models.version
+    monkeypatch.setattr(app, "probability_grid", small)
+
+    row = {"orbital_period": 365.0, "transit_depth": 3269.0, "planet_radius": 6.0, "stellar_radius": 1.05}
+    expected = app.predict_ensemble([row], models=models)
+    np.testing.assert_allclose(app.predict_ensemble([row], use_grid=True, models=models), expected, rtol=0, atol=0)
@@ -1,24 +1,26 @@
 # training/data_preparation.py
 
 import os
+import json
+import hashlib
+import argparse
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.model_selection import train_test_split
 
 # -----------------------------
-# Paths (all on D: drive)
+# Paths (override with env vars or CLI flags)
 # -----------------------------
-RAW_DIR = r"D:\exoplanet\data\raw"
-PROCESSED_DIR = r"D:\exoplanet\data\processed\train_test_split"
-os.makedirs(PROCESSED_DIR, exist_ok=True)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DIR = os.environ.get("EXO_RAW_DIR", os.path.join(BASE_DIR, "data", "raw"))
+PROCESSED_DIR = os.environ.get("EXO_PROCESSED_DIR", os.path.join(BASE_DIR, "data", "processed", "train_test_split"))
+CACHE_DIR = os.environ.get("EXO_PREP_CACHE_DIR", os.path.join(BASE_DIR, "data", "processed", "cache"))
 
 # -----------------------------
-# Load CSVs with mappings
+# Source catalogues and column mappings
 # -----------------------------
-def load_and_map_koi(path):
-    df = pd.read_csv(path, comment="#", engine='python', on_bad_lines='skip')
-    df.columns = df.columns.str.strip()
-
-    mapping = {
+SOURCES = {
+    "koi": ("koi.csv", {
         "koi_period": "orbital_period",
         "koi_duration": "transit_duration",
         "koi_depth": "transit_depth",
@@ -33,22 +35,8 @@ def load_and_map_koi(path):
         "koi_slogg": "stellar_logg",
         "koi_smet": "stellar_metallicity",
         "koi_disposition": "label"
-    }
-
-    df = df.rename(columns=mapping)
-    if "label" not in df.columns:
-        print(f"Warning: 'label' column missing in {path}, skipping dataset")
-        return pd.DataFrame()
-
-    cols_to_keep = [col for col in mapping.values() if col in df.columns]
-    return df[cols_to_keep]
-
-
-def load_and_map_toi(path):
-    df = pd.read_csv(path, comment="#", engine='python', on_bad_lines='skip')
-    df.columns = df.columns.str.strip()
-
-    mapping = {
+    }),
+    "toi": ("toi.csv", {
         "pl_orbper": "orbital_period",
         "pl_trandurh": "transit_duration",
         "pl_trandep": "transit_depth",
@@ -62,22 +50,8 @@ def load_and_map_toi(path):
         "st_teff": "stellar_temp",
         "st_logg": "stellar_logg",
         "tfopwg_disp": "label"
-    }
-
-    df = df.rename(columns=mapping)
-    if "label" not in df.columns:
-        print(f"Warning: 'label' column missing in {path}, skipping dataset")
-        return pd.DataFrame()
-
-    cols_to_keep = [col for col in mapping.values() if col in df.columns]
-    return df[cols_to_keep]
-
-
-def load_and_map_k2(path):
-    df = pd.read_csv(path, comment="#", engine='python', on_bad_lines='skip')
-    df.columns = df.columns.str.strip()
-
-    mapping = {
+    }),
+    "k2": ("k2.csv", {
         "pl_orbper": "orbital_period",
         "pl_trandur": "transit_duration",
         "pl_trandep": "transit_depth",
@@ -91,15 +65,98 @@ def load_and_map_k2(path):
         "st_teff": "stellar_temp",
         "st_logg": "stellar_logg",
         "disposition": "label"
-    }
+    }),
+}
+
+# Bump when the parsing/mapping logic changes, to invalidate cached parses
+CACHE_FORMAT = 1
+
+
+# -----------------------------
+# Typed table I/O (Parquet when an engine is installed)
+# -----------------------------
+def parquet_available():
+    for engine in ("pyarrow", "fastparquet"):
+        try:
+            __import__(engine)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+def write_table(df, path_stem):
+    """Write df as <stem>.parquet, or <stem>.pkl (also typed) without a Parquet engine. Returns the path."""
+    if parquet_available():
+        path = path_stem + ".parquet"
+        df.to_parquet(path, index=False)
+    else:
+        path = path_stem + ".pkl"
+        df.to_pickle(path)
+    return path
+
+
+def read_table(path_stem):
+    for ext, reader in ((".parquet", pd.read_parquet), (".pkl", pd.read_pickle)):
+        if os.path.exists(path_stem + ext):
+            return reader(path_stem + ext)
+    raise FileNotFoundError(f"No table at {path_stem}.parquet/.pkl")
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
+
+# -----------------------------
+# Load CSVs with mappings
+# -----------------------------
+def load_and_map(path, mapping):
+    """C-engine parse of only the mapped columns, renamed to the shared schema."""
+    df = pd.read_csv(
+        path, comment="#", engine="c", on_bad_lines="skip", low_memory=False,
+        usecols=lambda c: c.strip() in mapping,
+    )
+    df.columns = df.columns.str.strip()
     df = df.rename(columns=mapping)
     if "label" not in df.columns:
         print(f"Warning: 'label' column missing in {path}, skipping dataset")
         return pd.DataFrame()
 
     cols_to_keep = [col for col in mapping.values() if col in df.columns]
-    return df[cols_to_keep]
+    df = df[cols_to_keep].copy()
+    numeric = [c for c in cols_to_keep if c != "label"]
+    df[numeric] = df[numeric].apply(pd.to_numeric, errors="coerce").astype("float64")
+    return df
+
+
+def load_source(name, raw_dir, cache_dir, force=False):
+    """
+    Parsed + mapped catalogue `name`, reusing the cached parse when the
+    source file's sha256 (and the mapping) is unchanged. Returns (df, cache_hit).
+    """
+    filename, mapping = SOURCES[name]
+    path = os.path.join(raw_dir, filename)
+    key = hashlib.sha256(json.dumps([CACHE_FORMAT, file_sha256(path), mapping], sort_keys=True).encode()).hexdigest()
+    stem = os.path.join(cache_dir, name)
+    manifest_path = stem + ".json"
+    if not force:
+        try:
+            with open(manifest_path) as f:
+                if json.load(f).get("key") == key:
+                    return read_table(stem), True
+        except (OSError, ValueError):
+            pass
+
+    df = load_and_map(path, mapping)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_table(df, stem)
+    with open(manifest_path, "w") as f:
+        json.dump({"key": key, "source": path, "rows": len(df)}, f)
+    return df, False
 
 
 # -----------------------------
@@ -112,26 +169,30 @@ def map_labels(df):
         "CONFIRMED": 2
     }
     df["label"] = df["label"].map(mapping)
-    return df.dropna(subset=["label"])
+    df = df.dropna(subset=["label"])
+    df["label"] = df["label"].astype("int64")
+    return df
 
 
 # -----------------------------
 # Main pipeline
 # -----------------------------
-def main():
-    print("Loading KOI...")
-    koi = load_and_map_koi(os.path.join(RAW_DIR, "koi.csv"))
-
-    print("Loading TOI...")
-    toi = load_and_map_toi(os.path.join(RAW_DIR, "toi.csv"))
-
-    print("Loading K2...")
-    k2 = load_and_map_k2(os.path.join(RAW_DIR, "k2.csv"))
-
-    data = pd.concat([koi, toi, k2], ignore_index=True)
+def prepare(raw_dir=RAW_DIR, processed_dir=PROCESSED_DIR, cache_dir=CACHE_DIR, force=False, workers=None):
+    """Parse the three catalogues concurrently, merge, clean and write the train/test split."""
+    os.makedirs(processed_dir, exist_ok=True)
+    names = list(SOURCES)
+    workers = workers or min(len(names), os.cpu_count() or 1)
+    print(f"Loading {', '.join(n.upper() for n in names)} ({workers} worker(s))...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(load_source, n, raw_dir, cache_dir, force) for n in names]
+        loaded = [f.result() for f in futures]
+    for name, (df, hit) in zip(names, loaded):
+        print(f"  {name.upper()}: {len(df)} rows ({'cached' if hit else 'parsed'})")
+
+    data = pd.concat([df for df, _ in loaded], ignore_index=True)
     if data.empty:
         print("No valid data with labels found. Exiting.")
-        return
+        return None
 
     print(f"Total records before cleaning: {len(data)}")
 
@@ -144,11 +205,24 @@ def main():
     # Train-test split
     train, test = train_test_split(data, test_size=0.2, stratify=data["label"], random_state=42)
 
-    # Save processed CSVs
-    train.to_csv(os.path.join(PROCESSED_DIR, "train.csv"), index=False)
-    test.to_csv(os.path.join(PROCESSED_DIR, "test.csv"), index=False)
+    # Save typed tables, plus the CSVs that feature_engineering.py reads
+    for split, df in (("train", train), ("test", test)):
+        write_table(df, os.path.join(processed_dir, split))
+        df.to_csv(os.path.join(processed_dir, f"{split}.csv"), index=False)
 
-    print(f"Processed train/test saved to {PROCESSED_DIR}")
+    print(f"Processed train/test saved to {processed_dir}")
+    return train, test
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the KOI/TOI/K2 catalogues into a train/test split")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--processed-dir", default=PROCESSED_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-parse even if the sources are unchanged")
+    args = parser.parse_args()
+    prepare(args.raw_dir, args.processed_dir, args.cache_dir, args.force, args.workers)
 
 
 if __name__ == "__main__":
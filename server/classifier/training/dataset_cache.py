@@ -0,0 +1,197 @@
+# training/dataset_cache.py
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Paths (override with env vars)
+# -----------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEATURE_DIR = os.environ.get("EXO_FEATURE_DIR", os.path.join(BASE_DIR, "data", "processed", "features"))
+
+# -----------------------------
+# Config
+# -----------------------------
+CACHE_SUBDIR = "cache"
+MANIFEST_FILE = "dataset.json"
+CACHE_FORMAT = 1
+LABEL_COL = "label"
+SPLITS = ("train", "test")
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def csv_path(split, feature_dir=FEATURE_DIR):
+    return os.path.join(feature_dir, f"{split}_features.csv")
+
+
+def cache_path(split, feature_dir=FEATURE_DIR):
+    return os.path.join(feature_dir, CACHE_SUBDIR, split)
+
+
+# -----------------------------
+# Binary Dataset
+# -----------------------------
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format") == CACHE_FORMAT else None
+
+
+def write_dataset(X, y, columns, out_dir, source=None):
+    """
+    X.npy (float32, C order), y.npy (int32) and dataset.json with the column
+    order, published atomically so concurrent readers never see a partial set.
+    """
+    tmp_dir = f"{out_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    np.save(os.path.join(tmp_dir, "X.npy"), X)
+    if y is not None:
+        np.save(os.path.join(tmp_dir, "y.npy"), np.asarray(y).astype(np.int32))
+    manifest = {"format": CACHE_FORMAT, "rows": int(X.shape[0]), "columns": list(columns),
+                "dtype": "float32", "labels": y is not None, "source": source or {}}
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        # another process published the same dataset first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return manifest
+
+
+def read_dataset(out_dir, manifest=None, mmap_mode="r"):
+    """(X, y or None, columns); X and y are read-only memory maps by default."""
+    manifest = manifest or _read_manifest(out_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No dataset cache in {out_dir}")
+    X = np.load(os.path.join(out_dir, "X.npy"), mmap_mode=mmap_mode)
+    y = np.load(os.path.join(out_dir, "y.npy"), mmap_mode=mmap_mode) if manifest["labels"] else None
+    return X, y, manifest["columns"]
+
+
+def write_frame(df, out_dir, source=None, label_col=LABEL_COL):
+    """Cache a feature DataFrame (features + optional label column)."""
+    y = df[label_col].to_numpy() if label_col in df.columns else None
+    X = df.drop(columns=[label_col], errors="ignore")
+    return write_dataset(X.to_numpy(dtype=np.float32), y, X.columns.tolist(), out_dir, source)
+
+
+def csv_source(path):
+    """Identity of a CSV the cache was built from (checked by load_features)."""
+    return {"path": os.path.abspath(path), "stat": _stat_key(path), "sha256": file_sha256(path)}
+
+
+def cache_csv(split, feature_dir=FEATURE_DIR, source=None):
+    """Parse <split>_features.csv and (re)write its binary cache."""
+    path = csv_path(split, feature_dir)
+    df = pd.read_csv(path, engine="c", dtype=np.float64)
+    write_frame(df, cache_path(split, feature_dir), source or csv_source(path))
+    return df
+
+
+# -----------------------------
+# Loading
+# -----------------------------
+def load_features(split, feature_dir=FEATURE_DIR, mmap_mode="r"):
+    """
+    (X, y, columns) of the "train" or "test" features, memory-mapped from
+    the binary cache. The cache is checked against <split>_features.csv the
+    same way the atmosphere snapshot is: a changed mtime/size only triggers
+    a sha256, and the CSV is re-parsed (and re-cached) only if its content
+    changed. Without the CSV, the cache is used as is.
+    """
+    out_dir = cache_path(split, feature_dir)
+    manifest = _read_manifest(out_dir)
+    path = csv_path(split, feature_dir)
+    if not os.path.exists(path):
+        return read_dataset(out_dir, manifest, mmap_mode)
+
+    stat = _stat_key(path)
+    source = manifest["source"] if manifest else {}
+    if manifest is not None and source.get("path") == os.path.abspath(path):
+        if source.get("stat") == stat:
+            return read_dataset(out_dir, manifest, mmap_mode)
+        sha = file_sha256(path)
+        if source.get("sha256") == sha:
+            source["stat"] = stat
+            try:
+                with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+                    json.dump(manifest, f)
+            except OSError:
+                pass
+            return read_dataset(out_dir, manifest, mmap_mode)
+    else:
+        sha = file_sha256(path)
+
+    print(f"🗄️ Caching {os.path.basename(path)} as float32 arrays in {out_dir}")
+    cache_csv(split, feature_dir, {"path": os.path.abspath(path), "stat": stat, "sha256": sha})
+    return read_dataset(out_dir, mmap_mode=mmap_mode)
+
+
+def load_frames(feature_dir=FEATURE_DIR):
+    """X_train, y_train, X_test, y_test as pandas objects that view the memory maps (no copies)."""
+    frames = []
+    for split in SPLITS:
+        X, y, columns = load_features(split, feature_dir)
+        frames += [pd.DataFrame(X, columns=columns, copy=False), pd.Series(y, name=LABEL_COL, copy=False)]
+    return tuple(frames)
+
+
+# -----------------------------
+# CLI: build, verify and time the cache
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Build the float32 binary cache of the feature datasets")
+    parser.add_argument("--feature-dir", default=FEATURE_DIR)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    for split in SPLITS:
+        if args.rebuild:
+            shutil.rmtree(cache_path(split, args.feature_dir), ignore_errors=True)
+        X, y, columns = load_features(split, args.feature_dir)
+
+        start = time.perf_counter()
+        df = pd.read_csv(csv_path(split, args.feature_dir), engine="c", dtype=np.float64)
+        t_csv = time.perf_counter() - start
+        start = time.perf_counter()
+        X, y, columns = load_features(split, args.feature_dir)
+        t_cache = time.perf_counter() - start
+
+        expected = df.drop(columns=[LABEL_COL]).to_numpy(dtype=np.float32)
+        if list(columns) != df.columns.drop(LABEL_COL).tolist() or not np.array_equal(X, expected) \
+                or not np.array_equal(y, df[LABEL_COL].to_numpy().astype(np.int32)):
+            print(f"❌ {split}: cache does not match the CSV")
+            return 1
+        print(f"✅ {split}: {X.shape[0]} x {X.shape[1]} float32 ({X.nbytes / 1e6:.2f} MB) | "
+              f"CSV parse {t_csv * 1e3:.1f} ms, cached load {t_cache * 1e3:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+# training/ensemble_training.py
+
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import joblib
+from scipy.optimize import minimize
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report, log_loss
+from sklearn.model_selection import StratifiedKFold, cross_val_predict, train_test_split
+from sklearn.utils.class_weight import compute_class_weight
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ensemble import EnsembleBlender, ENSEMBLE_FILE, PROB_FLOOR  # noqa: E402  (shared with serving)
+from dataset_cache import load_features as load_split  # noqa: E402
+from tuning import (  # noqa: E402
+    BASE_PARAMS, BEST_PARAMS_FILE, CLASSES, EARLY_STOPPING_ROUNDS, FEATURE_DIR, MODEL_DIR, N_SPLITS,
+    RANDOM_STATE, build_model,
+)
+
+# -----------------------------
+# Config
+# -----------------------------
+MEMBERS = ("lightgbm", "xgboost")
+MEMBER_FILES = {"lightgbm": "lightgbm_model.pkl", "xgboost": "xgboost_model.pkl"}
+# Share of each training set held out for the members' early stopping
+EARLY_STOPPING_FRACTION = 0.1
+META_C = 1.0  # inverse L2 strength of the stacking meta-learner
+LATENCY_REPEATS = 5
+
+
+def member_params(model, model_dir=MODEL_DIR):
+    """Tuned parameters from tuning.py when available, else the hand-picked ones."""
+    try:
+        with open(os.path.join(model_dir, BEST_PARAMS_FILE)) as f:
+            tuned = json.load(f).get(model, {}).get("params")
+    except (OSError, ValueError):
+        tuned = None
+    return tuned or dict(BASE_PARAMS[model])
+
+
+# -----------------------------
+# Member Fitting (process pool)
+# -----------------------------
+def fit_member(model, params, threads, X, y, w):
+    """Fit on (X, y) only: early stopping uses a stratified slice of it, never the rows being predicted."""
+    tr, es = train_test_split(np.arange(len(y)), test_size=EARLY_STOPPING_FRACTION, stratify=y,
+                              random_state=RANDOM_STATE)
+    est = build_model(model, params, threads)
+    if model == "lightgbm":
+        import lightgbm as lgb
+        est.fit(X[tr], y[tr], sample_weight=w[tr], eval_set=[(X[es], y[es])], eval_metric="multi_logloss",
+                callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)])
+    else:
+        est.fit(X[tr], y[tr], sample_weight=w[tr], eval_set=[(X[es], y[es])], verbose=False)
+    return est
+
+
+_WORKER = None
+
+
+def _init_worker(X, y, w, X_test, folds, threads):
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    warnings.filterwarnings("ignore", category=UserWarning)
+    warnings.filterwarnings("ignore", category=FutureWarning)
+    global _WORKER
+    _WORKER = (X, y, w, X_test, folds, threads)
+
+
+def _run_member(model, fold, params):
+    """fold >= 0: out-of-fold probabilities for that fold; fold None: the full fit and its test probabilities."""
+    X, y, w, X_test, folds, threads = _WORKER
+    start = time.perf_counter()
+    if fold is None:
+        est = fit_member(model, params, threads, X, y, w)
+        return {"model": model, "fold": None, "estimator": est, "probs": est.predict_proba(X_test),
+                "seconds": time.perf_counter() - start}
+    tr, val = folds[fold]
+    est = fit_member(model, params, threads, X[tr], y[tr], w[tr])
+    return {"model": model, "fold": fold, "index": val, "probs": est.predict_proba(X[val]),
+            "seconds": time.perf_counter() - start}
+
+
+def fit_members(members, X, y, X_test, workers, threads, n_splits=N_SPLITS, model_dir=MODEL_DIR):
+    """
+    Out-of-fold train probabilities (N, M, K), test probabilities (N_test, M, K)
+    and the full-data estimators. All member x fold fits, plus the full fits,
+    run together in one process pool.
+    """
+    classes = np.unique(y)
+    weights = dict(zip(classes, compute_class_weight(class_weight="balanced", classes=classes, y=y)))
+    w = np.array([weights[c] for c in y])
+    folds = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=RANDOM_STATE).split(X, y))
+
+    oof = np.zeros((len(y), len(members), len(CLASSES)))
+    test = np.zeros((len(X_test), len(members), len(CLASSES)))
+    estimators = {}
+    params = {m: member_params(m, model_dir) for m in members}
+    # full fits first: they are the longest items
+    tasks = [(m, None) for m in members] + [(m, k) for m in members for k in range(n_splits)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X, y, w, X_test, folds, threads)) as pool:
+        futures = [pool.submit(_run_member, m, k, params[m]) for m, k in tasks]
+        for future in futures:
+            res = future.result()
+            j = members.index(res["model"])
+            if res["fold"] is None:
+                estimators[res["model"]] = res["estimator"]
+                test[:, j] = res["probs"]
+            else:
+                oof[res["index"], j] = res["probs"]
+            which = "full fit" if res["fold"] is None else f"fold {res['fold'] + 1}/{n_splits}"
+            print(f"  -> {res['model']} {which}: {res['seconds']:.1f} s", flush=True)
+    return oof, test, estimators, params
+
+
+# -----------------------------
+# Blend Fitting
+# -----------------------------
+def multi_logloss(y, probs):
+    """log_loss on row-renormalized probabilities (float32 member outputs drift off 1)."""
+    probs = np.asarray(probs, dtype=np.float64)
+    return float(log_loss(y, probs / probs.sum(axis=1, keepdims=True), labels=CLASSES))
+
+
+def _softmax(z):
+    z = np.exp(z - z.max())
+    return z / z.sum()
+
+
+def fit_weights(P, y):
+    """Convex member weights minimizing the multi_logloss of the weighted average."""
+    if P.shape[1] == 1:
+        return np.ones(1)
+    rows = np.arange(len(y))
+
+    def loss(theta):
+        blend = np.einsum("nmk,m->nk", P, _softmax(theta))
+        return -np.mean(np.log(np.clip(blend[rows, y], PROB_FLOOR, 1.0)))
+
+    res = minimize(loss, np.zeros(P.shape[1]), method="Nelder-Mead", options={"xatol": 1e-6, "fatol": 1e-9})
+    return _softmax(res.x)
+
+
+def stacking_features(P):
+    return np.log(np.clip(P, PROB_FLOOR, 1.0)).reshape(len(P), -1)
+
+
+def fit_blend(P, y, members, method):
+    """
+    EnsembleBlender of `method` ("mean", "weights" or "stacking") fitted on
+    out-of-fold probabilities P, and its out-of-fold multi_logloss. For
+    stacking, the meta-learner is itself cross-validated for that number.
+    """
+    if method == "stacking":
+        meta = LogisticRegression(C=META_C, max_iter=2000)
+        cv = StratifiedKFold(n_splits=N_SPLITS, shuffle=True, random_state=RANDOM_STATE)
+        held_out = cross_val_predict(meta, stacking_features(P), y, cv=cv, method="predict_proba")
+        meta.fit(stacking_features(P), y)
+        blender = EnsembleBlender(members, "stacking", coef=meta.coef_, intercept=meta.intercept_)
+        return blender, multi_logloss(y, held_out)
+    weights = fit_weights(P, y) if method == "weights" else None
+    blender = EnsembleBlender(members, method, weights)
+    return blender, multi_logloss(y, blender.apply(P))
+
+
+def choose_blend(P, y, members, method="auto"):
+    methods = ("weights", "stacking") if method == "auto" else (method,)
+    fitted = [fit_blend(P, y, members, m) for m in methods]
+    for blender, loss in fitted:
+        print(f"  {blender.method:<9} out-of-fold logloss {loss:.4f}")
+    return min(fitted, key=lambda f: f[1])
+
+
+# -----------------------------
+# Member Contribution Report
+# -----------------------------
+def member_latency_ms(est, X, repeats=LATENCY_REPEATS):
+    """Median predict_proba wall time per 1000 rows."""
+    est.predict_proba(X[:10])
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        est.predict_proba(X)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1e3 * 1000 / len(X))
+
+
+def n_trees(est):
+    if hasattr(est, "booster_"):
+        return int(est.booster_.num_trees() if est.best_iteration_ is None
+                   else est.best_iteration_ * est.n_classes_)
+    best = est.get_booster().attr("best_iteration")
+    return int((int(best) + 1 if best is not None else est.n_estimators) * est.n_classes_)
+
+
+def contribution_report(P, y, members, method, estimators, X_test):
+    """
+    Per member: its own out-of-fold accuracy/logloss, how much the blend loses
+    without it (refit on the others), and its inference cost. `gain_per_ms`
+    is the accuracy it adds per millisecond of latency per 1000 rows.
+    """
+    full, _ = fit_blend(P, y, members, method)
+    full_probs = full.apply(P)
+    full_acc = accuracy_score(y, full_probs.argmax(1))
+    full_loss = multi_logloss(y, full_probs)
+    report = {}
+    for j, m in enumerate(members):
+        own = P[:, j]
+        rest = [i for i in range(len(members)) if i != j]
+        if rest:
+            others, _ = fit_blend(P[:, rest], y, [members[i] for i in rest], method)
+            without = others.apply(P[:, rest])
+        else:
+            without = np.full_like(own, 1.0 / own.shape[1])
+        latency = member_latency_ms(estimators[m], X_test)
+        delta_acc = full_acc - accuracy_score(y, without.argmax(1))
+        delta_loss = multi_logloss(y, without) - full_loss
+        report[m] = {
+            "oof_accuracy": float(accuracy_score(y, own.argmax(1))),
+            "oof_logloss": multi_logloss(y, own),
+            "blend_accuracy_gain": float(delta_acc),
+            "blend_logloss_gain": float(delta_loss),
+            "latency_ms_per_1k": latency,
+            "trees": n_trees(estimators[m]),
+            "gain_per_ms": float(delta_acc / latency) if latency > 0 else 0.0,
+            "helps": bool(delta_acc > 0 or delta_loss > 0),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n  {'member':<9} {'oof acc':>8} {'oof loss':>9} {'+acc':>8} {'-loss':>8} "
+          f"{'ms/1k':>7} {'trees':>6} {'acc/ms':>9}")
+    for m, r in report.items():
+        print(f"  {m:<9} {r['oof_accuracy']:8.4f} {r['oof_logloss']:9.4f} {r['blend_accuracy_gain']:+8.4f} "
+              f"{r['blend_logloss_gain']:+8.4f} {r['latency_ms_per_1k']:7.2f} {r['trees']:6d} "
+              f"{r['gain_per_ms']:+9.5f}{'' if r['helps'] else '  <- no gain, drop candidate'}")
+
+
+# -----------------------------
+# Data
+# -----------------------------
+def load_features(feature_dir=FEATURE_DIR):
+    print("🔄 Loading feature datasets...")
+    X_train, y_train, columns = load_split("train", feature_dir)
+    X_test, y_test, _ = load_split("test", feature_dir)
+    return X_train, np.asarray(y_train, dtype=np.int64), X_test, np.asarray(y_test, dtype=np.int64), list(columns)
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Out-of-fold stacking ensemble for the boosted-tree members")
+    parser.add_argument("--members", default=",".join(MEMBERS))
+    parser.add_argument("--method", choices=("auto", "mean", "weights", "stacking"), default="auto")
+    parser.add_argument("--splits", type=int, default=N_SPLITS)
+    parser.add_argument("--workers", type=int, default=None, help="default: one per core, up to the number of fits")
+    parser.add_argument("--threads-per-worker", type=int, default=None, help="default: cores // workers")
+    parser.add_argument("--drop-unhelpful", action="store_true",
+                        help="leave out members that add neither accuracy nor logloss to the blend")
+    args = parser.parse_args()
+
+    members = [m for m in args.members.split(",") if m]
+    n_fits = len(members) * (args.splits + 1)
+    workers = args.workers or max(1, min(cores, n_fits))
+    threads = args.threads_per_worker or max(1, cores // workers)
+
+    X_train, y_train, X_test, y_test, feature_cols = load_features()
+    print(f"\n--- 🧠 Out-of-fold member fits: {n_fits} fits, {workers} worker(s) x {threads} thread(s) ---")
+    start = time.perf_counter()
+    oof, test, estimators, params = fit_members(members, X_train, y_train, X_test, workers, threads, args.splits)
+    print(f"✅ Members fitted in {time.perf_counter() - start:.1f} s")
+
+    print("\n--- 🤝 Fitting the blend ---")
+    blender, oof_loss = choose_blend(oof, y_train, members, args.method)
+    report = contribution_report(oof, y_train, members, blender.method, estimators, X_test)
+    print_report(report)
+
+    keep = [m for m in members if report[m]["helps"]] if args.drop_unhelpful else members
+    if keep and keep != members:
+        print(f"✂️ Dropping {[m for m in members if m not in keep]}; refitting the blend on {keep}")
+        idx = [members.index(m) for m in keep]
+        blender, oof_loss = choose_blend(oof[:, idx], y_train, keep, args.method)
+        oof, test, members = oof[:, idx], test[:, idx], keep
+
+    blender.report = {"oof_logloss": oof_loss, "members": report, "params": params,
+                      "feature_cols": feature_cols}
+    ensemble_probs = blender.apply(test)
+    mean_probs = test.mean(axis=1)
+    print(f"\n🔹 Ensemble ({blender.method}) Test Report:")
+    print(classification_report(y_test, ensemble_probs.argmax(1)))
+    print(f"Accuracy: {accuracy_score(y_test, ensemble_probs.argmax(1)):.4f} | "
+          f"logloss: {multi_logloss(y_test, ensemble_probs):.4f} "
+          f"(equal average: {accuracy_score(y_test, mean_probs.argmax(1)):.4f} / "
+          f"{multi_logloss(y_test, mean_probs):.4f})")
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    for m, est in estimators.items():
+        joblib.dump(est, os.path.join(MODEL_DIR, MEMBER_FILES[m]))
+    blender.save(os.path.join(MODEL_DIR, ENSEMBLE_FILE))
+    np.save(os.path.join(MODEL_DIR, "ensemble_probs.npy"), ensemble_probs)
+    print(f"\n✨ Members, {ENSEMBLE_FILE} and ensemble_probs.npy saved in {MODEL_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import json
 import pandas as pd
 import numpy as np
 from sklearn.metrics import classification_report, accuracy_score
@@ -8,6 +9,8 @@ import lightgbm as lgb
 import xgboost as xgb
 import joblib
 import warnings
+from dataset_cache import FEATURE_DIR, load_frames
+from tuning import BEST_PARAMS_FILE, MODEL_DIR
 
 # -----------------------------
 # Warnings & Random Seed
@@ -17,13 +20,27 @@ RANDOM_STATE = 42
 np.random.seed(RANDOM_STATE)
 
 # -----------------------------
-# Paths
+# Paths (EXO_FEATURE_DIR / EXO_MODEL_DIR, shared with tuning.py and ensemble_training.py)
 # -----------------------------
-FEATURE_DIR = r"D:\exoplanet\data\processed\features"
-MODEL_DIR = r"D:\exoplanet\models"
 os.makedirs(MODEL_DIR, exist_ok=True)
 
 N_SPLITS = 5
+EARLY_STOPPING_ROUNDS = 50
+
+# Written by tuning.py; overrides the hand-picked hyperparameters below when present
+BEST_PARAMS_PATH = os.path.join(MODEL_DIR, BEST_PARAMS_FILE)
+
+def load_tuned_params(model):
+    """(params, n_estimators) selected by tuning.py; ({}, None) without a search result."""
+    try:
+        with open(BEST_PARAMS_PATH) as f:
+            best = json.load(f).get(model, {})
+    except (OSError, ValueError):
+        return {}, None
+    tuned, n_estimators = best.get("params", {}), best.get("n_estimators")
+    if tuned:
+        print(f"🎛️ Using tuned {model} parameters from {BEST_PARAMS_PATH}: {tuned}, n_estimators {n_estimators}")
+    return tuned, n_estimators
 
 # -----------------------------
 # Data Loading
@@ -31,17 +48,12 @@ N_SPLITS = 5
 def load_and_preprocess_data():
     print("🔄 Loading data and computing class weights...")
     try:
-        train_df = pd.read_csv(os.path.join(FEATURE_DIR, "train_features.csv"))
-        test_df = pd.read_csv(os.path.join(FEATURE_DIR, "test_features.csv"))
+        # float32 memory maps of the binary cache (built from the CSVs on first use)
+        X_train, y_train, X_test, y_test = load_frames(FEATURE_DIR)
     except FileNotFoundError as e:
         print(f"❌ Error: {e}. Run feature_engineering.py first.")
         raise
 
-    X_train = train_df.drop("label", axis=1)
-    y_train = train_df["label"]
-    X_test = test_df.drop("label", axis=1)
-    y_test = test_df["label"]
-
     classes = np.unique(y_train)
     class_weights = compute_class_weight(class_weight="balanced", classes=classes, y=y_train)
     class_weight_dict = {cls: weight for cls, weight in zip(classes, class_weights)}
@@ -65,12 +77,17 @@ def train_lightgbm(X_train, y_train, X_test, y_test, class_weight_dict):
         'class_weight': class_weight_dict,
         'verbose': -1
     }
+    tuned, tuned_n_estimators = load_tuned_params("lightgbm")
+    if "subsample" in tuned:
+        tuned = {**tuned, "subsample_freq": 1}
+    params.update(tuned)
 
-    EARLY_STOPPING_ROUNDS = 50
     skf = StratifiedKFold(n_splits=N_SPLITS, shuffle=True, random_state=RANDOM_STATE)
     best_iterations = []
 
-    for fold, (train_idx, val_idx) in enumerate(skf.split(X_train, y_train)):
+    # tuning.py already picked the tree count from its CV best iterations
+    folds = [] if tuned_n_estimators else skf.split(X_train, y_train)
+    for fold, (train_idx, val_idx) in enumerate(folds):
         print(f"  -> Fold {fold+1}/{N_SPLITS}")
         X_tr, X_val = X_train.iloc[train_idx], X_train.iloc[val_idx]
         y_tr, y_val = y_train.iloc[train_idx], y_train.iloc[val_idx]
@@ -84,7 +101,7 @@ def train_lightgbm(X_train, y_train, X_test, y_test, class_weight_dict):
         )
         best_iterations.append(lgb_model.best_iteration_)
 
-    final_n_estimators = int(np.mean(best_iterations) * 1.1) if best_iterations else 1000
+    final_n_estimators = tuned_n_estimators or (int(np.mean(best_iterations) * 1.1) if best_iterations else 1000)
     print(f"Final LGBM n_estimators: {final_n_estimators}")
 
     final_params = params.copy()
@@ -106,44 +123,47 @@ def train_lightgbm(X_train, y_train, X_test, y_test, class_weight_dict):
 # XGBoost Training
 # -----------------------------
 def train_xgboost(X_train, y_train, X_test, y_test, class_weight_dict):
-    print("\n--- 🧠 Training XGBoost Model ---")
+    print("\n--- 🧠 Training XGBoost Model (CV + Early Stopping) ---")
     sample_weights = y_train.map(class_weight_dict).values
 
-    xgb_model = xgb.XGBClassifier(
+    xgb_params = dict(
         n_estimators=1000,
         learning_rate=0.05,
         max_depth=6,
         objective="multi:softprob",
         eval_metric="mlogloss",
-        use_label_encoder=False,
         n_jobs=-1,
         random_state=RANDOM_STATE,
         verbosity=0
     )
+    tuned, tuned_n_estimators = load_tuned_params("xgboost")
+    xgb_params.update(tuned)
 
-    # Check XGBoost version for early stopping support
-    xgb_version = tuple(map(int, xgb.__version__.split(".")[:2]))
-    try:
-        if xgb_version >= (1, 6):
-            # Modern versions support early stopping
-            X_train_val = X_train.iloc[200:]
-            y_train_val = y_train.iloc[200:]
-            sw_train_val = y_train_val.map(class_weight_dict).values
-            X_val_set = X_train.iloc[:200]
-            y_val_set = y_train.iloc[:200]
-            xgb_model.fit(
-                X_train_val, y_train_val,
-                sample_weight=sw_train_val,
-                eval_set=[(X_val_set, y_val_set)],
-                early_stopping_rounds=50,
-                verbose=False
-            )
-        else:
-            # Older versions - train without early stopping
-            xgb_model.fit(X_train, y_train, sample_weight=sample_weights)
-    except TypeError:
-        # Fallback if early_stopping_rounds not accepted
-        xgb_model.fit(X_train, y_train, sample_weight=sample_weights)
+    # Same scheme as LightGBM: early stopping on held-out stratified folds
+    # (xgboost >= 1.6 takes early_stopping_rounds in the constructor)
+    skf = StratifiedKFold(n_splits=N_SPLITS, shuffle=True, random_state=RANDOM_STATE)
+    best_iterations = []
+
+    folds = [] if tuned_n_estimators else skf.split(X_train, y_train)
+    for fold, (train_idx, val_idx) in enumerate(folds):
+        print(f"  -> Fold {fold+1}/{N_SPLITS}")
+        X_tr, X_val = X_train.iloc[train_idx], X_train.iloc[val_idx]
+        y_tr, y_val = y_train.iloc[train_idx], y_train.iloc[val_idx]
+
+        fold_model = xgb.XGBClassifier(**xgb_params, early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+        fold_model.fit(
+            X_tr, y_tr,
+            sample_weight=sample_weights[train_idx],
+            eval_set=[(X_val, y_val)],
+            verbose=False
+        )
+        best_iterations.append(fold_model.best_iteration + 1)
+
+    final_n_estimators = tuned_n_estimators or (int(np.mean(best_iterations) * 1.1) if best_iterations else 1000)
+    print(f"Final XGBoost n_estimators: {final_n_estimators}")
+
+    xgb_model = xgb.XGBClassifier(**{**xgb_params, "n_estimators": final_n_estimators})
+    xgb_model.fit(X_train, y_train, sample_weight=sample_weights)
 
     xgb_preds = xgb_model.predict(X_test)
     xgb_probs = xgb_model.predict_proba(X_test)
@@ -0,0 +1,348 @@
+# training/tuning.py
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from sklearn.metrics import log_loss
+from sklearn.model_selection import StratifiedKFold
+from sklearn.utils.class_weight import compute_class_weight
+from dataset_cache import load_features
+
+# -----------------------------
+# Paths (override with env vars)
+# -----------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEATURE_DIR = os.environ.get("EXO_FEATURE_DIR", os.path.join(BASE_DIR, "data", "processed", "features"))
+MODEL_DIR = os.environ.get("EXO_MODEL_DIR", os.path.join(BASE_DIR, "models"))
+SEARCH_DIR = os.environ.get("EXO_SEARCH_DIR", os.path.join(BASE_DIR, "data", "processed", "search"))
+BEST_PARAMS_FILE = "best_params.json"
+
+# -----------------------------
+# Config
+# -----------------------------
+RANDOM_STATE = 42
+N_SPLITS = 5
+N_ESTIMATORS = 1000
+EARLY_STOPPING_ROUNDS = 50
+CLASSES = [0, 1, 2]
+
+# A trial is pruned once its mean fold multi_logloss is above the median of
+# the other trials that reached the same fold (needs PRUNE_STARTUP_TRIALS of them)
+PRUNE_AFTER_FOLD = 1
+PRUNE_STARTUP_TRIALS = 4
+
+# Trial 0 of every search is the current hand-picked configuration
+BASE_PARAMS = {
+    "lightgbm": {"learning_rate": 0.05, "num_leaves": 31},
+    "xgboost": {"learning_rate": 0.05, "max_depth": 6},
+}
+
+# name: (kind, low, high); kind is "float", "log" (log-uniform) or "int"
+SEARCH_SPACES = {
+    "lightgbm": {
+        "learning_rate": ("log", 0.01, 0.2),
+        "num_leaves": ("int", 15, 127),
+        "min_child_samples": ("int", 5, 100),
+        "subsample": ("float", 0.6, 1.0),
+        "colsample_bytree": ("float", 0.5, 1.0),
+        "reg_lambda": ("log", 1e-3, 10.0),
+    },
+    "xgboost": {
+        "learning_rate": ("log", 0.01, 0.2),
+        "max_depth": ("int", 3, 10),
+        "min_child_weight": ("log", 0.5, 20.0),
+        "subsample": ("float", 0.6, 1.0),
+        "colsample_bytree": ("float", 0.5, 1.0),
+        "reg_lambda": ("log", 1e-3, 10.0),
+    },
+}
+
+
+def sample_params(model, trial, seed=RANDOM_STATE):
+    """Hyperparameters of `trial`; a pure function of (seed, trial) so resumed searches agree."""
+    if trial == 0:
+        return dict(BASE_PARAMS[model])
+    rng = np.random.RandomState([seed, trial])
+    params = {}
+    for name, (kind, low, high) in SEARCH_SPACES[model].items():
+        if kind == "int":
+            params[name] = int(rng.randint(low, high + 1))
+        elif kind == "log":
+            params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            params[name] = float(rng.uniform(low, high))
+    return params
+
+
+# -----------------------------
+# Single Fold
+# -----------------------------
+def build_model(model, params, threads):
+    if model == "lightgbm":
+        import lightgbm as lgb
+        extra = {"subsample_freq": 1} if "subsample" in params else {}
+        return lgb.LGBMClassifier(
+            n_estimators=N_ESTIMATORS, objective="multiclass", random_state=RANDOM_STATE,
+            n_jobs=threads, verbose=-1, **extra, **params
+        )
+    import xgboost as xgb
+    return xgb.XGBClassifier(
+        n_estimators=N_ESTIMATORS, objective="multi:softprob", eval_metric="mlogloss",
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS, random_state=RANDOM_STATE,
+        n_jobs=threads, verbosity=0, **params
+    )
+
+
+def fit_fold(model, params, threads, X_tr, y_tr, w_tr, X_val, y_val):
+    """Fit with early stopping on the validation fold. Returns (multi_logloss, trees used)."""
+    est = build_model(model, params, threads)
+    if model == "lightgbm":
+        import lightgbm as lgb
+        est.fit(X_tr, y_tr, sample_weight=w_tr, eval_set=[(X_val, y_val)], eval_metric="multi_logloss",
+                callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)])
+        n_trees = est.best_iteration_ or N_ESTIMATORS
+    else:
+        est.fit(X_tr, y_tr, sample_weight=w_tr, eval_set=[(X_val, y_val)], verbose=False)
+        n_trees = est.best_iteration + 1
+    return float(log_loss(y_val, est.predict_proba(X_val), labels=CLASSES)), int(n_trees)
+
+
+# Per-worker state, set once by the pool initializer instead of pickled per task
+_WORKER = None
+
+
+def _init_worker(X, y, w, folds, threads):
+    # cap the OpenMP pools before lightgbm / xgboost are imported in this process
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    warnings.filterwarnings("ignore", category=UserWarning)
+    warnings.filterwarnings("ignore", category=FutureWarning)  # lightgbm's eval_set deprecation
+    global _WORKER
+    _WORKER = (X, y, w, folds, threads)
+
+
+def _run_fold(model, trial, fold, params):
+    X, y, w, folds, threads = _WORKER
+    tr, val = folds[fold]
+    start = time.perf_counter()
+    loss, n_trees = fit_fold(model, params, threads, X[tr], y[tr], w[tr], X[val], y[val])
+    return {"trial": trial, "fold": fold, "params": params, "loss": loss,
+            "n_trees": n_trees, "seconds": time.perf_counter() - start}
+
+
+# -----------------------------
+# Search Journal (resume)
+# -----------------------------
+class SearchJournal:
+    """
+    Append-only JSONL record of finished folds and pruned trials. Reopening
+    the same path replays it, so an interrupted search resumes where it
+    stopped and finished folds are never refit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.folds = {}    # trial -> {fold: record}
+        self.pruned = {}   # trial -> fold it was pruned after
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        break  # torn last line from an interrupted write
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _apply(self, entry):
+        if "pruned_at" in entry:
+            self.pruned[entry["trial"]] = entry["pruned_at"]
+        else:
+            self.folds.setdefault(entry["trial"], {})[entry["fold"]] = entry
+
+    def record(self, entry):
+        self._apply(entry)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def mean_loss(self, trial, upto):
+        folds = self.folds.get(trial, {})
+        return float(np.mean([folds[k]["loss"] for k in range(upto + 1)]))
+
+    def reached(self, fold):
+        """Trials with every fold up to `fold` finished."""
+        return [t for t, folds in self.folds.items() if all(k in folds for k in range(fold + 1))]
+
+
+def config_key(model, X, y, n_splits, seed):
+    """Journals are keyed by everything a fold result depends on."""
+    h = hashlib.sha256()
+    h.update(json.dumps([model, SEARCH_SPACES[model], BASE_PARAMS[model], n_splits, seed,
+                         N_ESTIMATORS, EARLY_STOPPING_ROUNDS]).encode())
+    h.update(np.ascontiguousarray(X).tobytes())
+    h.update(np.ascontiguousarray(y).tobytes())
+    return h.hexdigest()[:12]
+
+
+# -----------------------------
+# Orchestrator
+# -----------------------------
+def search(model, X, y, n_trials, workers=1, threads=1, n_splits=N_SPLITS, search_dir=SEARCH_DIR,
+           seed=RANDOM_STATE, prune=True, log=print):
+    """
+    Cross-validated random search over SEARCH_SPACES[model]. Work items are
+    single folds, run in a process pool of `workers` processes with
+    `threads` threads each (keep workers * threads <= cores). A trial's next
+    fold is queued when its previous one finishes, unless it was pruned.
+    """
+    X = np.asarray(X, dtype=np.float32)  # a memory map stays one (shared by forked workers)
+    y = np.asarray(y).astype(np.int64)
+    weights = compute_class_weight(class_weight="balanced", classes=np.unique(y), y=y)
+    w = dict(zip(np.unique(y), weights))
+    w = np.array([w[c] for c in y])
+    folds = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed).split(X, y))
+
+    journal = SearchJournal(os.path.join(search_dir, f"{model}_{config_key(model, X, y, n_splits, seed)}.jsonl"))
+    params = {t: sample_params(model, t, seed) for t in range(n_trials)}
+
+    def next_fold(t):
+        done = len(journal.folds.get(t, {}))
+        return None if t in journal.pruned or done >= n_splits else done
+
+    def should_prune(t, fold):
+        if not prune or t == 0 or fold < PRUNE_AFTER_FOLD or fold == n_splits - 1:
+            return False
+        others = [journal.mean_loss(o, fold) for o in journal.reached(fold) if o != t]
+        return len(others) >= PRUNE_STARTUP_TRIALS and journal.mean_loss(t, fold) > float(np.median(others))
+
+    resumed = sum(len(f) for t, f in journal.folds.items() if t < n_trials)
+    if resumed:
+        log(f"  resuming {model}: {resumed} fold(s) already in {journal.path}")
+
+    start = time.perf_counter()
+    idle = deque(t for t in range(n_trials) if next_fold(t) is not None)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X, y, w, folds, threads)) as pool:
+        running = {}
+        while idle or running:
+            while idle and len(running) < workers:
+                t = idle.popleft()
+                running[pool.submit(_run_fold, model, t, next_fold(t), params[t])] = t
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                t = running.pop(future)
+                rec = future.result()
+                journal.record(rec)
+                if should_prune(t, rec["fold"]):
+                    journal.record({"trial": t, "pruned_at": rec["fold"]})
+                    log(f"  {model} trial {t}: pruned after fold {rec['fold'] + 1} "
+                        f"(logloss {journal.mean_loss(t, rec['fold']):.4f})")
+                elif next_fold(t) is not None:
+                    idle.appendleft(t)  # finish started trials first, so pruning has data early
+                else:
+                    log(f"  {model} trial {t}: cv logloss {journal.mean_loss(t, n_splits - 1):.4f}")
+    wall = time.perf_counter() - start
+
+    complete = [t for t in range(n_trials) if t not in journal.pruned and len(journal.folds.get(t, {})) == n_splits]
+    best = min(complete, key=lambda t: journal.mean_loss(t, n_splits - 1))
+    best_folds = journal.folds[best].values()
+    return {
+        "model": model,
+        "trial": best,
+        "params": params[best],
+        "cv_logloss": journal.mean_loss(best, n_splits - 1),
+        "cv_logloss_std": float(np.std([r["loss"] for r in best_folds])),
+        # same rule as lgbm_training: 10% over the mean early-stopping point
+        "n_estimators": int(np.mean([r["n_trees"] for r in best_folds]) * 1.1),
+        "trials": n_trials,
+        "completed": len(complete),
+        "pruned": sum(1 for t in journal.pruned if t < n_trials),
+        "wall_seconds": wall,
+        "workers": workers,
+        "threads_per_worker": threads,
+    }
+
+
+def save_best_params(results, model_dir=MODEL_DIR):
+    """Merge search results into models/best_params.json (read by lgbm_training.py)."""
+    path = os.path.join(model_dir, BEST_PARAMS_FILE)
+    try:
+        with open(path) as f:
+            best = json.load(f)
+    except (OSError, ValueError):
+        best = {}
+    for res in results:
+        best[res["model"]] = {k: res[k] for k in ("params", "n_estimators", "cv_logloss", "trial")}
+    with open(path, "w") as f:
+        json.dump(best, f, indent=2)
+    return path
+
+
+# -----------------------------
+# Data
+# -----------------------------
+def load_training_data(feature_dir=FEATURE_DIR):
+    X, y, _ = load_features("train", feature_dir)
+    return X, y
+
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+def benchmark(X, y, models, cores, workers, threads, n_splits=N_SPLITS):
+    """
+    Wall clock of one cross-validation of the base parameters: the current
+    sequential scheme (one fold after another, all cores per fold) against
+    folds in parallel. Uses throwaway journals so nothing is resumed.
+    """
+    rows = []
+    for model in models:
+        for label, w, t in (("sequential", 1, cores), ("parallel", workers, threads)):
+            with tempfile.TemporaryDirectory() as tmp:
+                res = search(model, X, y, 1, w, t, n_splits, tmp, prune=False, log=lambda *a: None)
+            rows.append((model, label, w, t, res["wall_seconds"]))
+            print(f"  {model:<9} {label:<10} {w:>3} worker(s) x {t:>2} thread(s): {res['wall_seconds']:7.2f} s", flush=True)
+    return rows
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Parallel CV / hyperparameter search for the boosted-tree models")
+    parser.add_argument("--models", default="lightgbm,xgboost")
+    parser.add_argument("--trials", type=int, default=40)
+    parser.add_argument("--splits", type=int, default=N_SPLITS)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None, help="default: cores // threads-per-worker")
+    parser.add_argument("--no-prune", action="store_true")
+    parser.add_argument("--benchmark", action="store_true", help="time sequential vs parallel CV and exit")
+    args = parser.parse_args()
+
+    threads = max(1, args.threads_per_worker)
+    workers = args.workers or max(1, cores // threads)
+    models = [m for m in args.models.split(",") if m]
+    X, y = load_training_data()
+    print(f"🔄 {len(y)} training rows, {cores} core(s): {workers} worker(s) x {threads} thread(s)")
+
+    if args.benchmark:
+        benchmark(X, y, models, cores, min(workers, args.splits), threads, args.splits)
+        return
+
+    results = []
+    for model in models:
+        print(f"\n--- 🔍 {model}: {args.trials} trial(s) x {args.splits} folds ---", flush=True)
+        res = search(model, X, y, args.trials, workers, threads, args.splits, prune=not args.no_prune)
+        print(f"✅ best trial {res['trial']}: cv logloss {res['cv_logloss']:.4f} ± {res['cv_logloss_std']:.4f}, "
+              f"n_estimators {res['n_estimators']}, params {res['params']}")
+        print(f"   {res['completed']} completed, {res['pruned']} pruned in {res['wall_seconds']:.1f} s")
+        results.append(res)
+    print(f"\n✨ Best parameters saved at: {save_best_params(results)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())